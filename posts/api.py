@@ -0,0 +1,84 @@
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.views.decorators.http import require_safe
+
+from .conditional import (group_scope, index_scope, page_condition,
+                          post_scope, profile_scope)
+from .models import Group, Post, User
+from .paginator import CursorPaginator
+from yatube.settings import POSTS_PER_PAGE
+
+
+def serialize_post(request, post):
+    return {
+        'id': post.pk,
+        'author': post.author.username,
+        'group': post.group.slug if post.group_id else None,
+        'text': post.text,
+        'pub_date': post.pub_date.isoformat(),
+        'comment_count': post.comment_count,
+        'image': request.build_absolute_uri(post.image.url)
+        if post.image else None,
+        'url': request.build_absolute_uri(
+            reverse('post', args=[post.author.username, post.pk])),
+    }
+
+
+def serialize_comment(comment):
+    return {
+        'id': comment.pk,
+        'author': comment.author.username,
+        'text': comment.text,
+        'created': comment.created.isoformat(),
+    }
+
+
+def page_response(request, object_list, serialize, ordering, extra=None):
+    paginator = CursorPaginator(object_list, POSTS_PER_PAGE, ordering)
+    page = paginator.get_cursor_page(request.GET.get('cursor'))
+    links = {}
+    for name, cursor in (('next', page.next_cursor),
+                         ('previous', page.previous_cursor)):
+        links[name] = cursor and request.build_absolute_uri(
+            f'{request.path}?cursor={cursor}')
+    return JsonResponse(
+        dict(extra or {}, results=[serialize(obj) for obj in page],
+             **links),
+        json_dumps_params={'ensure_ascii': False})
+
+
+def feed_response(request, posts):
+    return page_response(request, posts.feed(),
+                         lambda post: serialize_post(request, post),
+                         ('-pub_date', '-id'))
+
+
+@require_safe
+@page_condition(index_scope)
+def index(request):
+    return feed_response(request, Post.objects.all())
+
+
+@require_safe
+@page_condition(group_scope)
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return feed_response(request, group.posts.all())
+
+
+@require_safe
+@page_condition(profile_scope)
+def profile(request, username):
+    author = get_object_or_404(User, username=username)
+    return feed_response(request, author.posts.all())
+
+
+@require_safe
+@page_condition(post_scope)
+def post_view(request, username, post_id):
+    post = get_object_or_404(Post.objects.feed(), pk=post_id,
+                             author__username=username)
+    return page_response(
+        request, post.comments.select_related('author'), serialize_comment,
+        ('-created', '-id'), extra={'post': serialize_post(request, post)})
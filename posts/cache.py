@@ -0,0 +1,162 @@
+import hashlib
+import math
+import time
+import uuid
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import patch_vary_headers
+
+from .thumbnails import prefetch_thumbnails
+
+POST_VERSION_KEY = 'post_version:{}'
+GROUP_VERSION_KEY = 'group_version:{}'
+AUTHOR_VERSION_KEY = 'author_version:{}'
+POST_CARD_KEY = 'post_card:{}:{}:{}'
+
+SITE_GENERATION_KEY = 'site_generation'
+FEED_GENERATION_KEY = 'feed_generation'
+GROUP_GENERATION_KEY = 'group_generation:{slug}'
+AUTHOR_GENERATION_KEY = 'author_generation:{}'
+POST_GENERATION_KEY = 'post_generation:{post_id}'
+PAGE_KEY = 'anonymous_page:{}:{}'
+
+
+def new_version():
+    # Случайная версия, а не счётчик: после удаления поста и повторного
+    # использования его id старые карточки не совпадут с новой версией.
+    # Время смены в начале версии нужно для Last-Modified: удаление не
+    # оставляет в базе даты, от которой его можно было бы отсчитать.
+    return f'{time.time():.6f}-{uuid.uuid4().hex}'
+
+
+def version_time(version):
+    """Момент смены версии с округлением вверх до секунды, как в HTTP."""
+    moment, separator, _ = version.partition('-')
+    if not separator:
+        # Версия, записанная до появления времени в версиях.
+        return None
+    return datetime.fromtimestamp(math.ceil(float(moment)), timezone.utc)
+
+
+def after_commit(function):
+    """Версия или поколение меняются только после фиксации транзакции.
+
+    Иначе параллельный читатель успел бы отрендерить ещё старые данные
+    под новой версией, и кеш без срока жизни хранил бы их навсегда.
+    Вне транзакции функция выполняется сразу.
+    """
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        transaction.on_commit(lambda: function(*args, **kwargs))
+    return wrapper
+
+
+@after_commit
+def bump_post_version(post_id):
+    cache.set(POST_VERSION_KEY.format(post_id), new_version(), None)
+
+
+@after_commit
+def bump_group_version(group_id):
+    cache.set(GROUP_VERSION_KEY.format(group_id), new_version(), None)
+
+
+@after_commit
+def bump_author_version(author_id):
+    cache.set(AUTHOR_VERSION_KEY.format(author_id), new_version(), None)
+
+
+@after_commit
+def forget_post_version(post_id):
+    cache.delete(POST_VERSION_KEY.format(post_id))
+
+
+def author_generation_key(username):
+    # В имени пользователя бывают пробелы и не-ASCII символы, которые
+    # нельзя класть в ключ memcached.
+    return AUTHOR_GENERATION_KEY.format(
+        hashlib.md5(username.encode()).hexdigest())
+
+
+def get_versions(keys):
+    """Версии по ключам одним запросом к кешу; недостающие создаются."""
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, new_version(), None)
+            versions[key] = cache.get(key)
+    return versions
+
+
+def attach_card_versions(posts):
+    keys = {}
+    for post in posts:
+        keys[post.pk] = [POST_VERSION_KEY.format(post.pk),
+                         AUTHOR_VERSION_KEY.format(post.author_id)]
+        if post.group_id:
+            keys[post.pk].append(GROUP_VERSION_KEY.format(post.group_id))
+    versions = get_versions(
+        list({key for post_keys in keys.values() for key in post_keys}))
+    for post in posts:
+        post.card_version = '.'.join(
+            versions[key] for key in keys[post.pk])
+
+
+def post_card_key(post, user):
+    if getattr(post, 'card_version', None) is None:
+        attach_card_versions([post])
+    is_author = getattr(user, 'pk', None) == post.author_id
+    return POST_CARD_KEY.format(post.pk, post.card_version, int(is_author))
+
+
+def prefetch_post_cards(posts, user):
+    """Готовые карточки страницы ленты за два запроса к кешу."""
+    posts = list(posts)
+    attach_card_versions(posts)
+    cards = cache.get_many([post_card_key(post, user) for post in posts])
+    for post in posts:
+        post.cached_cards = cards
+    # Карточки, которых нет в кеше, будут отрендерены с тегом thumbnail.
+    prefetch_thumbnails([
+        post for post in posts if post_card_key(post, user) not in cards])
+
+
+@after_commit
+def bump_generations(keys):
+    cache.set_many({key: new_version() for key in keys}, None)
+
+
+def cache_anonymous_page(generation_key):
+    """Кеширует страницу для анонимных посетителей.
+
+    Ключ страницы включает поколения сайта и раздела: generation_key -
+    шаблон, который форматируется аргументами view, или функция от них.
+    Сигналы меняют поколения при записи, поэтому устаревшая страница
+    больше никогда не будет найдена.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET' or request.user.is_authenticated:
+                return view(request, *args, **kwargs)
+            section = (generation_key(**kwargs) if callable(generation_key)
+                       else generation_key.format(**kwargs))
+            keys = [SITE_GENERATION_KEY, section]
+            generations = get_versions(keys)
+            path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+            page_key = PAGE_KEY.format(
+                path, '.'.join(generations[key] for key in keys))
+            response = cache.get(page_key)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                patch_vary_headers(response, ('Cookie',))
+                if response.status_code == 200 and not response.cookies:
+                    cache.set(page_key, response,
+                              settings.ANONYMOUS_PAGE_CACHE_TIMEOUT)
+            return response
+        return wrapper
+    return decorator
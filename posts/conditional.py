@@ -0,0 +1,95 @@
+import hashlib
+from functools import wraps
+
+from django.db.models import Max
+from django.db.models.functions import Coalesce, Greatest
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from .cache import (FEED_GENERATION_KEY, GROUP_GENERATION_KEY,
+                    POST_GENERATION_KEY, SITE_GENERATION_KEY,
+                    author_generation_key, get_versions, version_time)
+from .models import Post
+
+
+def page_state(request, posts, generation_key, newest=Max('pub_date')):
+    """Last-Modified и ETag ответа, считаются один раз на запрос.
+
+    Дата - одна агрегатная выборка по индексу; поколения из кеша
+    меняются сигналами при любом изменении, в том числе при удалении
+    и правке, которые не двигают дату. Поэтому дата не раньше смены
+    поколений: иначе после удаления самой новой записи она ушла бы
+    назад, и клиент с одним If-Modified-Since получил бы 304. Без
+    записей в базе даты нет вовсе, и отвечает только ETag.
+    Пользователь входит в ETag: HTML-страницы для автора, читателя и
+    анонима различаются. Входит и CSRF-токен: формы страницы содержат
+    его, а после нового входа он другой. По той же причине
+    авторизованным не отдаётся Last-Modified - по одной дате страница
+    со старым токеном получила бы 304.
+    """
+    state = getattr(request, 'conditional_state', None)
+    if state is None:
+        # Без COUNT: одиночный MAX SQLite берёт из края индекса.
+        last_modified = posts.order_by().aggregate(
+            last_modified=newest)['last_modified']
+        keys = [SITE_GENERATION_KEY, generation_key]
+        versions = get_versions(keys)
+        if last_modified is not None:
+            last_modified = max(filter(None, [last_modified, *(
+                version_time(versions[key]) for key in keys)]))
+        raw = '|'.join([request.get_full_path(), str(last_modified),
+                        str(request.user.pk),
+                        request.META.get('CSRF_COOKIE', '')]
+                       + [versions[key] for key in keys])
+        if request.user.is_authenticated:
+            last_modified = None
+        state = request.conditional_state = (
+            last_modified, hashlib.md5(raw.encode()).hexdigest())
+    return state
+
+
+def page_condition(scope):
+    """condition для view, чьи посты и ключ поколения даёт scope.
+
+    Ответ помечается no-cache: браузер каждый раз переспрашивает
+    сервер и получает 304, пока страница не изменилась.
+    """
+    def last_modified(request, **kwargs):
+        return page_state(request, *scope(**kwargs))[0]
+
+    def etag(request, **kwargs):
+        return page_state(request, *scope(**kwargs))[1]
+
+    def decorator(view):
+        conditional_view = condition(
+            etag_func=etag, last_modified_func=last_modified)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            patch_cache_control(response, no_cache=True)
+            return response
+        return wrapper
+    return decorator
+
+
+def index_scope():
+    return Post.objects.all(), FEED_GENERATION_KEY
+
+
+def group_scope(slug):
+    return (Post.objects.filter(group__slug=slug),
+            GROUP_GENERATION_KEY.format(slug=slug))
+
+
+def profile_scope(username):
+    return (Post.objects.filter(author__username=username),
+            author_generation_key(username))
+
+
+def post_scope(username, post_id):
+    # Страница поста меняется с правкой поста и с новым комментарием.
+    return (Post.objects.filter(pk=post_id, author__username=username),
+            POST_GENERATION_KEY.format(post_id=post_id),
+            Max(Greatest('updated', Coalesce('comments__created',
+                                             'updated'))))
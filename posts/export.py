@@ -0,0 +1,48 @@
+import csv
+import json
+
+from .models import Post
+
+FIELDS = ('id', 'author', 'group', 'text', 'pub_date', 'comment_count',
+          'image')
+CHUNK_SIZE = 2000
+
+
+def export_rows(queryset, image_url=None):
+    """Строки выгрузки постов; в памяти не больше CHUNK_SIZE строк."""
+    storage = Post._meta.get_field('image').storage
+    rows = queryset.order_by('-pub_date', '-id').values_list(
+        'pk', 'author__username', 'group__slug', 'text', 'pub_date',
+        'comment_count', 'image')
+    for pk, author, group, text, pub_date, comment_count, image in (
+            rows.iterator(chunk_size=CHUNK_SIZE)):
+        url = storage.url(image) if image else None
+        if url and image_url:
+            url = image_url(url)
+        yield dict(zip(FIELDS, (pk, author, group, text,
+                                pub_date.isoformat(), comment_count, url)))
+
+
+def render_jsonl(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+class Echo:
+    """Файл для csv.writer, который возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def render_csv(rows):
+    writer = csv.DictWriter(Echo(), FIELDS)
+    yield writer.writerow(dict(zip(FIELDS, FIELDS)))
+    for row in rows:
+        yield writer.writerow(row)
+
+
+FORMATS = {
+    'jsonl': (render_jsonl, 'application/x-ndjson'),
+    'csv': (render_csv, 'text/csv'),
+}
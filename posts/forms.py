@@ -1,14 +1,25 @@
 from django import forms
 from django.forms import ModelForm
 
+from .images import process_image
 from .models import Comment, Post
 
 
+class PostImageField(forms.ImageField):
+
+    def to_python(self, data):
+        upload = forms.FileField.to_python(self, data)
+        if upload is None:
+            return None
+        return process_image(upload)
+
+
 class PostForm(ModelForm):
 
     class Meta:
         model = Post
         fields = ('text', 'group', 'image')
+        field_classes = {'image': PostImageField}
 
 
 class CommentForm(ModelForm):
@@ -0,0 +1,56 @@
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image, ImageOps
+
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 85, 'optimize': True, 'progressive': True},
+    'PNG': {'optimize': True},
+    'GIF': {'optimize': True},
+    'WEBP': {'quality': 85},
+}
+EXTENSIONS = {'JPEG': '.jpg', 'PNG': '.png', 'GIF': '.gif', 'WEBP': '.webp'}
+
+
+def process_image(upload):
+    """Уменьшает загруженную картинку до POST_IMAGE_MAX_SIDE и удаляет EXIF.
+
+    Размер проверяется по заголовку ещё до декодирования, JPEG
+    декодируется сразу в уменьшенном виде (draft), остальные форматы
+    уменьшаются через reduce внутри thumbnail.
+    """
+    if upload.size > settings.POST_IMAGE_MAX_UPLOAD_SIZE:
+        raise ValidationError('Файл слишком большой.', code='file_too_big')
+    upload.seek(0)
+    try:
+        image = Image.open(upload)
+        width, height = image.size
+        if width * height > settings.POST_IMAGE_MAX_PIXELS:
+            raise ValidationError(
+                'Слишком большое разрешение изображения.',
+                code='too_many_pixels')
+        image_format = image.format
+        max_side = settings.POST_IMAGE_MAX_SIDE
+        if image_format == 'JPEG':
+            image.draft('RGB', (max_side, max_side))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_side, max_side), reducing_gap=2.0)
+    except (OSError, SyntaxError, Image.DecompressionBombError) as error:
+        raise ValidationError(
+            'Загрузите правильное изображение.',
+            code='invalid_image') from error
+    if image_format not in SAVE_OPTIONS:
+        image_format = 'JPEG'
+    if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    buffer = BytesIO()
+    # info не передаётся в save, поэтому EXIF и прочие метаданные
+    # в сохранённый файл не попадают.
+    image.save(buffer, image_format, **SAVE_OPTIONS[image_format])
+    name = os.path.splitext(os.path.basename(upload.name))[0]
+    return SimpleUploadedFile(
+        name + EXTENSIONS[image_format], buffer.getvalue(),
+        content_type=Image.MIME[image_format])
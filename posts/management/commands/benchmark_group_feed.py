@@ -0,0 +1,91 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from posts.management.rollback import rolled_back
+from posts.models import Group, Post, User
+from posts.paginator import NEXT, CursorPaginator
+from yatube.settings import POSTS_PER_PAGE
+
+
+class Command(BaseCommand):
+    help = ('Замеряет время страниц ленты группы при её росте; '
+            'все созданные данные откатываются')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+',
+            default=[1000, 10000, 100000, 1000000],
+            help='Размеры группы, на которых делается замер')
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Сколько раз выбирать каждую страницу')
+        parser.add_argument(
+            '--batch-size', type=int, default=10000,
+            help='Размер пачки bulk_create')
+        parser.add_argument(
+            '--max-ratio', type=float, default=3.0,
+            help='Допустимый рост медианы от меньшей группы к большей')
+
+    def handle(self, *args, **options):
+        results = []
+        with rolled_back():
+            self.run(results, options)
+        first, last = results[0][1], results[-1][1]
+        ratio = last / first if first else 0
+        self.stdout.write(f'Рост медианы: x{ratio:.2f}')
+        if ratio > options['max_ratio']:
+            raise CommandError(
+                f'Время страницы выросло в {ratio:.2f} раза, '
+                f'допустимо {options["max_ratio"]}')
+
+    def run(self, results, options):
+        author = User.objects.create(username='benchmark-group-feed')
+        group = Group.objects.create(
+            title='Benchmark', slug='benchmark-group-feed',
+            description='Benchmark')
+        # Посты без группы, чтобы группа была не единственной в таблице.
+        self.fill(author, None, 1000, options['batch_size'])
+        size = 0
+        for target in sorted(options['sizes']):
+            self.fill(author, group, target - size, options['batch_size'])
+            size = target
+            timings = self.measure(group, size, options['repeat'])
+            median = statistics.median(timings)
+            results.append((size, median))
+            self.stdout.write(
+                f'{size:>9} постов: медиана {median * 1000:.3f} мс, '
+                f'максимум {max(timings) * 1000:.3f} мс')
+
+    @staticmethod
+    def fill(author, group, count, batch_size):
+        while count > 0:
+            batch = min(count, batch_size)
+            Post.objects.bulk_create(
+                Post(text='benchmark', author=author, group=group)
+                for _ in range(batch))
+            count -= batch
+
+    @staticmethod
+    def measure(group, size, repeat):
+        """Первая, средняя и последняя страницы по курсору."""
+        paginator = CursorPaginator(group.posts.feed(), POSTS_PER_PAGE)
+        ordered = group.posts.order_by(*paginator.ordering)
+        cursors = [None] + [
+            paginator.encode_cursor(NEXT, ordered[position])
+            for position in (size // 2, max(size - POSTS_PER_PAGE - 1, 0))
+        ]
+        timings = []
+        for _ in range(repeat):
+            for cursor in cursors:
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    page = paginator.cursor_page(cursor)
+                    timings.append(time.perf_counter() - started)
+                if len(queries) != 1 or not page:
+                    raise CommandError(
+                        'Страница должна выбираться одним запросом')
+        return timings
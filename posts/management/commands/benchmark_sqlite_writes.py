@@ -0,0 +1,130 @@
+import os
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from yatube.sqlite.base import apply_pragmas
+
+SCHEMA = (
+    'CREATE TABLE post (id INTEGER PRIMARY KEY, comment_count INTEGER)',
+    'CREATE TABLE comment (id INTEGER PRIMARY KEY, post_id INTEGER, '
+    'text TEXT, created TEXT)',
+    'CREATE INDEX comment_post ON comment (post_id, created)',
+)
+
+
+class Profile:
+    def __init__(self, name, pragmas, persistent, begin):
+        self.name = name
+        self.pragmas = pragmas
+        self.persistent = persistent
+        self.begin = begin
+
+    def connect(self, path):
+        # Как Django: autocommit и явный BEGIN для транзакций.
+        connection = sqlite3.connect(path, isolation_level=None)
+        apply_pragmas(connection, self.pragmas)
+        return connection
+
+
+PROFILES = (
+    Profile('default', {}, persistent=False, begin='BEGIN'),
+    Profile('tuned', settings.SQLITE_PRAGMAS, persistent=True,
+            begin='BEGIN IMMEDIATE'),
+)
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает конкурентную запись комментариев в SQLite '
+            'с настройками по умолчанию и с SQLITE_PRAGMAS')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads', type=int, default=8,
+            help='Число одновременных писателей')
+        parser.add_argument(
+            '--writes', type=int, default=200,
+            help='Число записей на один поток')
+        parser.add_argument(
+            '--posts', type=int, default=10,
+            help='Между сколькими постами распределяются комментарии')
+
+    def handle(self, *args, **options):
+        for profile in PROFILES:
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'benchmark.sqlite3')
+                result = self.run(profile, path, options)
+            self.stdout.write(
+                f'{profile.name:>8}: {result["throughput"]:.0f} записей/с, '
+                f'p50 {result["p50"] * 1000:.2f} мс, '
+                f'p99 {result["p99"] * 1000:.2f} мс, '
+                f'ошибок "database is locked": {result["errors"]}')
+
+    def run(self, profile, path, options):
+        setup = profile.connect(path)
+        for statement in SCHEMA:
+            setup.execute(statement)
+        setup.executemany(
+            'INSERT INTO post (id, comment_count) VALUES (?, 0)',
+            [(pk,) for pk in range(1, options['posts'] + 1)])
+        setup.close()
+        latencies, errors = [], []
+        lock = threading.Lock()
+        start = threading.Barrier(options['threads'])
+
+        def writer(number):
+            connection = profile.connect(path) if profile.persistent else None
+            own_latencies, own_errors = [], 0
+            start.wait()
+            for index in range(options['writes']):
+                post_id = (number + index) % options['posts'] + 1
+                started = time.perf_counter()
+                # Без постоянных соединений каждый запрос открывает новое.
+                current = connection or profile.connect(path)
+                try:
+                    current.execute(profile.begin)
+                    current.execute(
+                        'INSERT INTO comment (post_id, text, created) '
+                        "VALUES (?, 'benchmark', datetime('now'))",
+                        [post_id])
+                    current.execute(
+                        'UPDATE post SET comment_count = comment_count + 1 '
+                        'WHERE id = ?', [post_id])
+                    current.execute('COMMIT')
+                    own_latencies.append(time.perf_counter() - started)
+                except sqlite3.OperationalError:
+                    if current.in_transaction:
+                        current.execute('ROLLBACK')
+                    own_errors += 1
+                finally:
+                    if connection is None:
+                        current.close()
+            if connection is not None:
+                connection.close()
+            with lock:
+                latencies.extend(own_latencies)
+                errors.append(own_errors)
+
+        threads = [
+            threading.Thread(target=writer, args=(number,))
+            for number in range(options['threads'])
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        latencies.sort()
+        p99 = latencies[int(len(latencies) * 0.99)] if latencies else 0
+        return {
+            'throughput': len(latencies) / elapsed,
+            'p50': statistics.median(latencies) if latencies else 0,
+            'p99': p99,
+            'errors': sum(errors),
+        }
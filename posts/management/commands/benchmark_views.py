@@ -0,0 +1,193 @@
+import json
+import platform
+import shutil
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+import django
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.management.rollback import rolled_back
+from posts.models import Post, User
+from posts.paginator import NEXT, CursorPaginator
+from posts.seed import placeholder_image, seed
+from yatube.settings import POSTS_PER_PAGE
+
+# Метрики, рост которых считается регрессией.
+COMPARED = ('p50', 'p95', 'queries', 'peak_memory_kb')
+TIMINGS = ('p50', 'p95')
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(int(len(values) * share), len(values) - 1)]
+
+
+class Command(BaseCommand):
+    help = ('Замеряет задержку, число запросов и пик памяти основных '
+            'view на наборах данных разного размера; данные откатываются')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+',
+            default=[10000, 100000, 1000000],
+            help='Число постов в наборах данных')
+        parser.add_argument(
+            '--requests', type=int, default=50,
+            help='Число замеряемых запросов к каждому view')
+        parser.add_argument(
+            '--warmup', type=int, default=5,
+            help='Число запросов прогрева перед замером')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--output', help='Куда записать результаты в JSON')
+        parser.add_argument(
+            '--compare', help='JSON прошлого запуска для сравнения')
+        parser.add_argument(
+            '--threshold', type=float, default=0.25,
+            help='Допустимый относительный рост метрик при сравнении')
+        parser.add_argument(
+            '--min-delta-ms', type=float, default=1.0,
+            help='Меньший рост времени считается шумом')
+
+    def handle(self, *args, **options):
+        media_root = tempfile.mkdtemp()
+        results = {}
+        try:
+            with override_settings(MEDIA_ROOT=media_root):
+                for size in options['sizes']:
+                    results[str(size)] = self.run_size(size, options)
+        finally:
+            shutil.rmtree(media_root, ignore_errors=True)
+        report = {
+            'meta': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'seed': options['seed'],
+                'requests': options['requests'],
+            },
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, indent=2, sort_keys=True)
+        if options['compare']:
+            with open(options['compare']) as file:
+                self.compare(json.load(file), report, options)
+
+    def run_size(self, size, options):
+        results = {}
+        with rolled_back():
+            started = time.perf_counter()
+            dataset = seed(size, seed_value=options['seed'])
+            self.stdout.write(
+                f'{size} постов: данные созданы за '
+                f'{time.perf_counter() - started:.1f} с')
+            for name, request in self.scenarios(dataset).items():
+                results[name] = self.measure(request, options)
+                self.stdout.write(self.format(size, name, results[name]))
+        cache.clear()
+        return results
+
+    def scenarios(self, dataset):
+        """Запросы к view: функция(client) -> response."""
+        reader = User.objects.create(username='benchmark-reader')
+        client = Client(HTTP_HOST='localhost')
+        client.force_login(reader)
+        paginator = CursorPaginator(Post.objects.all(), POSTS_PER_PAGE)
+        middle = Post.objects.order_by('-pub_date', '-id')[
+            Post.objects.count() // 2]
+        deep_cursor = paginator.encode_cursor(NEXT, middle)
+        post_url = reverse('post', args=[dataset['post_author'],
+                                         dataset['post']])
+        comment_url = reverse('add_comment', args=[
+            dataset['post_author'], dataset['post']])
+
+        image = placeholder_image((200, 120, 40), size=(1200, 800))
+
+        def new_post():
+            upload = SimpleUploadedFile('bench.jpg', image, 'image/jpeg')
+            return client.post(reverse('new_post'), {
+                'text': 'Пост из замера', 'image': upload})
+
+        return {
+            'index': lambda: client.get(reverse('index')),
+            'index_deep': lambda: client.get(
+                reverse('index'), {'cursor': deep_cursor}),
+            'group_posts': lambda: client.get(
+                reverse('group_posts', args=[dataset['group']])),
+            'profile': lambda: client.get(
+                reverse('profile', args=[dataset['author']])),
+            'post_view': lambda: client.get(post_url),
+            'new_post_form': lambda: client.get(reverse('new_post')),
+            'new_post': new_post,
+            'add_comment': lambda: client.post(
+                comment_url, {'text': 'Комментарий из замера'}),
+        }
+
+    def measure(self, request, options):
+        for _ in range(options['warmup']):
+            self.ensure_ok(request())
+        timings, queries = [], []
+        for _ in range(options['requests']):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                self.ensure_ok(request())
+                timings.append(time.perf_counter() - started)
+            queries.append(len(captured))
+        # Память замеряется отдельным запросом: tracemalloc замедляет код.
+        tracemalloc.start()
+        try:
+            self.ensure_ok(request())
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return {
+            'p50': statistics.median(timings) * 1000,
+            'p95': percentile(timings, 0.95) * 1000,
+            'p99': percentile(timings, 0.99) * 1000,
+            'queries': statistics.median(queries),
+            'peak_memory_kb': peak / 1024,
+        }
+
+    @staticmethod
+    def ensure_ok(response):
+        if response.status_code >= 400:
+            raise CommandError(f'Ответ {response.status_code}')
+
+    @staticmethod
+    def format(size, name, result):
+        return (f'{size:>8} {name:<14} p50 {result["p50"]:8.2f} мс  '
+                f'p95 {result["p95"]:8.2f} мс  p99 {result["p99"]:8.2f} мс  '
+                f'запросов {result["queries"]:5.1f}  '
+                f'память {result["peak_memory_kb"]:8.0f} КиБ')
+
+    def compare(self, baseline, report, options):
+        regressions = []
+        for size, views in report['results'].items():
+            for name, result in views.items():
+                old = baseline['results'].get(size, {}).get(name)
+                if old is None:
+                    continue
+                for metric in COMPARED:
+                    limit = old[metric] * (1 + options['threshold'])
+                    if metric in TIMINGS:
+                        limit = max(limit,
+                                    old[metric] + options['min_delta_ms'])
+                    if result[metric] > limit:
+                        regressions.append(
+                            f'{size} {name} {metric}: {old[metric]:.2f} -> '
+                            f'{result[metric]:.2f}')
+        for line in regressions:
+            self.stderr.write(f'Регрессия: {line}')
+        if regressions:
+            raise CommandError(f'Регрессий: {len(regressions)}')
+        self.stdout.write('Регрессий нет')
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.export import FORMATS, export_rows
+from posts.models import Group, User
+
+
+class Command(BaseCommand):
+    help = 'Выгружает посты автора или группы в JSONL или CSV'
+
+    def add_arguments(self, parser):
+        source = parser.add_mutually_exclusive_group(required=True)
+        source.add_argument('--author', help='Имя пользователя автора')
+        source.add_argument('--group', help='slug группы')
+        parser.add_argument(
+            '--format', choices=FORMATS, default='jsonl',
+            help='Формат выгрузки')
+        parser.add_argument(
+            '--output', default='-',
+            help='Файл для выгрузки, по умолчанию stdout')
+
+    def handle(self, *args, **options):
+        if options['author']:
+            owner = User.objects.filter(username=options['author']).first()
+        else:
+            owner = Group.objects.filter(slug=options['group']).first()
+        if owner is None:
+            raise CommandError('Автор или группа не найдены')
+        render_rows = FORMATS[options['format']][0]
+        chunks = render_rows(export_rows(owner.posts.all()))
+        if options['output'] == '-':
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+        else:
+            with open(options['output'], 'w', encoding='utf-8',
+                      newline='') as output:
+                output.writelines(chunks)
@@ -0,0 +1,34 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import generate_thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Заранее создаёт миниатюры картинок всех постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.THUMBNAIL_WORKERS,
+            help='Число параллельных потоков, 1 - без пула')
+
+    def handle(self, *args, **options):
+        images = (
+            Post.objects.exclude(image='').exclude(image__isnull=True)
+            .order_by().values_list('image', flat=True).distinct()
+        )
+        field = Post._meta.get_field('image')
+        files = (field.attr_class(None, field, name)
+                 for name in images.iterator())
+        if options['workers'] > 1:
+            with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+                results = list(pool.map(generate_thumbnails, files))
+        else:
+            results = [generate_thumbnails(image) for image in files]
+        done = results.count(True)
+        failed = len(results) - done
+        self.stdout.write(
+            f'Миниатюры готовы для {done} картинок, ошибок: {failed}')
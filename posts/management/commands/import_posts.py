@@ -0,0 +1,313 @@
+import csv
+import json
+import os
+import sys
+import time
+from collections import Counter
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts.cache import (POST_VERSION_KEY, SITE_GENERATION_KEY,
+                         bump_generations)
+from posts.models import Comment, Group, Post, User
+from posts.signals import change_author_posts_count, change_counter
+
+
+class InvalidRecord(Exception):
+    pass
+
+
+def read_jsonl(stream):
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        yield record if isinstance(record, dict) else None
+
+
+def read_csv(stream):
+    for row in csv.DictReader(stream):
+        yield {key: value for key, value in row.items() if value}
+
+
+READERS = {'jsonl': read_jsonl, 'csv': read_csv}
+
+
+def parse_date(value):
+    if not value:
+        return timezone.now()
+    date = parse_datetime(value)
+    if date is None:
+        raise InvalidRecord(f'неверная дата {value!r}')
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date)
+    return date
+
+
+def required(record, field):
+    value = record.get(field)
+    if value in (None, ''):
+        raise InvalidRecord(f'нет поля {field}')
+    return str(value)
+
+
+class Command(BaseCommand):
+    help = ('Импортирует группы, посты и комментарии из JSONL или CSV. '
+            'Каждая запись - объект с полем type: group (slug, title, '
+            'description), post (id, author, group, text, pub_date) или '
+            'comment (id, post, author, text, created). Родительские '
+            'записи должны идти в файле раньше дочерних.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл для импорта, - для stdin')
+        parser.add_argument(
+            '--format', choices=READERS,
+            help='Формат файла, по умолчанию - по расширению')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько записей вставлять в одной транзакции')
+        parser.add_argument(
+            '--source', default='import',
+            help='Префикс ключей импорта, чтобы id разных систем '
+                 'не совпадали')
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл с числом уже импортированных записей; '
+                 'по умолчанию <path>.checkpoint')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or os.path.splitext(path)[1][1:]
+        if file_format not in READERS:
+            raise CommandError('Укажите --format jsonl или csv')
+        checkpoint = options['checkpoint']
+        if checkpoint is None and path != '-':
+            checkpoint = f'{path}.checkpoint'
+        self.source = options['source']
+        self.verbosity = options['verbosity']
+        self.groups = {}
+        self.authors = {}
+        self.stats = Counter()
+        done = self.read_checkpoint(checkpoint)
+        stream = (sys.stdin if path == '-'
+                  else open(path, encoding='utf-8', newline=''))
+        started = time.perf_counter()
+        try:
+            records = islice(READERS[file_format](stream), done, None)
+            while True:
+                batch = list(islice(records, options['batch_size']))
+                if not batch:
+                    break
+                with transaction.atomic():
+                    self.import_batch(batch, first_line=done + 1)
+                # Записи вставлены без сигналов: кеш страниц сбрасывается
+                # целиком.
+                bump_generations([SITE_GENERATION_KEY])
+                done += len(batch)
+                self.write_checkpoint(checkpoint, done)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        elapsed = time.perf_counter() - started
+        if checkpoint and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        processed = sum(self.stats.values())
+        self.stdout.write(
+            f'Групп: {self.stats["group"]}, постов: {self.stats["post"]}, '
+            f'комментариев: {self.stats["comment"]}, '
+            f'уже были: {self.stats["existing"]}, '
+            f'ошибок: {self.stats["error"]}; '
+            f'{processed / elapsed if elapsed else 0:.0f} записей/с')
+
+    @staticmethod
+    def read_checkpoint(checkpoint):
+        if not checkpoint or not os.path.exists(checkpoint):
+            return 0
+        with open(checkpoint) as file:
+            return int(file.read().strip() or 0)
+
+    @staticmethod
+    def write_checkpoint(checkpoint, done):
+        if not checkpoint:
+            return
+        # Запись через временный файл: прерванный импорт не оставит
+        # наполовину записанного числа.
+        with open(f'{checkpoint}.tmp', 'w') as file:
+            file.write(str(done))
+        os.replace(f'{checkpoint}.tmp', checkpoint)
+
+    def error(self, line, message):
+        self.stats['error'] += 1
+        if self.verbosity > 1:
+            self.stderr.write(f'Запись {line}: {message}')
+
+    def import_batch(self, batch, first_line):
+        parsed = {'group': [], 'post': [], 'comment': []}
+        for line, record in enumerate(batch, first_line):
+            if record is None:
+                self.error(line, 'не разобрана')
+            elif record.get('type') not in parsed:
+                self.error(line, f'неизвестный type {record.get("type")!r}')
+            else:
+                parsed[record['type']].append((line, record))
+        self.import_groups(parsed['group'])
+        self.import_posts(parsed['post'])
+        self.import_comments(parsed['comment'])
+
+    def import_key(self, record):
+        return f'{self.source}:{required(record, "id")}'
+
+    def import_groups(self, records):
+        new = {}
+        for line, record in records:
+            try:
+                slug = required(record, 'slug')
+            except InvalidRecord as error:
+                self.error(line, error)
+                continue
+            new[slug] = Group(
+                slug=slug, title=record.get('title') or slug,
+                description=record.get('description') or '')
+        self.resolve_groups(new)
+        for slug in list(new):
+            if slug in self.groups:
+                self.stats['existing'] += 1
+                del new[slug]
+        Group.objects.bulk_create(new.values())
+        self.stats['group'] += len(new)
+        self.resolve_groups(new)
+
+    def resolve_groups(self, slugs):
+        missing = [slug for slug in slugs if slug not in self.groups]
+        if missing:
+            self.groups.update(Group.objects.filter(slug__in=missing)
+                               .values_list('slug', 'pk'))
+
+    def resolve_authors(self, usernames):
+        missing = {name for name in usernames if name not in self.authors}
+        if not missing:
+            return
+        self.authors.update(User.objects.filter(username__in=missing)
+                            .values_list('username', 'pk'))
+        new = missing - set(self.authors)
+        # Авторы из чужой системы создаются без пароля для входа.
+        User.objects.bulk_create(
+            User(username=name, password=make_password(None))
+            for name in new)
+        self.authors.update(User.objects.filter(username__in=new)
+                            .values_list('username', 'pk'))
+
+    def import_posts(self, records):
+        rows = {}
+        for line, record in records:
+            try:
+                rows[self.import_key(record)] = (line, {
+                    'author': required(record, 'author'),
+                    'group': record.get('group'),
+                    'text': required(record, 'text'),
+                    'pub_date': parse_date(record.get('pub_date')),
+                })
+            except InvalidRecord as error:
+                self.error(line, error)
+        existing = set(Post.objects.filter(import_key__in=rows)
+                       .values_list('import_key', flat=True))
+        self.stats['existing'] += len(existing)
+        self.resolve_authors(
+            row['author'] for key, (_, row) in rows.items()
+            if key not in existing)
+        self.resolve_groups(
+            row['group'] for key, (_, row) in rows.items()
+            if key not in existing and row['group'])
+        posts = []
+        for key, (line, row) in rows.items():
+            if key in existing:
+                continue
+            if row['group'] and row['group'] not in self.groups:
+                self.error(line, f'нет группы {row["group"]}')
+                continue
+            posts.append(Post(
+                import_key=key, text=row['text'],
+                author_id=self.authors[row['author']],
+                group_id=self.groups.get(row['group']),
+                pub_date=row['pub_date']))
+        self.insert(Post, posts, 'pub_date')
+        self.stats['post'] += len(posts)
+        for author_id, count in Counter(
+                post.author_id for post in posts).items():
+            change_author_posts_count(author_id, count)
+        for group_id, count in Counter(
+                post.group_id for post in posts if post.group_id).items():
+            change_counter(Group.objects.filter(pk=group_id),
+                           'posts_count', count)
+
+    def import_comments(self, records):
+        rows = {}
+        for line, record in records:
+            try:
+                rows[self.import_key(record)] = (line, {
+                    'post': f'{self.source}:{required(record, "post")}',
+                    'author': required(record, 'author'),
+                    'text': required(record, 'text'),
+                    'created': parse_date(record.get('created')),
+                })
+            except InvalidRecord as error:
+                self.error(line, error)
+        existing = set(Comment.objects.filter(import_key__in=rows)
+                       .values_list('import_key', flat=True))
+        self.stats['existing'] += len(existing)
+        new = {key: value for key, value in rows.items()
+               if key not in existing}
+        posts = dict(Post.objects.filter(
+            import_key__in={row['post'] for _, row in new.values()})
+            .values_list('import_key', 'pk'))
+        self.resolve_authors(row['author'] for _, row in new.values())
+        comments = []
+        for key, (line, row) in new.items():
+            if row['post'] not in posts:
+                self.error(line, f'нет поста {row["post"]}')
+                continue
+            comments.append(Comment(
+                import_key=key, text=row['text'],
+                post_id=posts[row['post']],
+                author_id=self.authors[row['author']],
+                created=row['created']))
+        self.insert(Comment, comments, 'created')
+        self.stats['comment'] += len(comments)
+        post_ids = {comment.post_id for comment in comments}
+        if post_ids:
+            # Один UPDATE на пачку вместо F() на каждый пост.
+            Post.objects.filter(pk__in=post_ids).update(
+                comment_count=Coalesce(Subquery(
+                    Comment.objects.filter(post=OuterRef('pk')).order_by()
+                    .values('post').annotate(count=Count('pk'))
+                    .values('count')), 0))
+            bump_generations(
+                [POST_VERSION_KEY.format(pk) for pk in post_ids])
+
+    @staticmethod
+    def insert(model, objects, date_field):
+        """bulk_create с датами из файла.
+
+        auto_now_add на время вставки отключается: иначе он заменил бы
+        даты текущим временем. Команда работает в отдельном процессе,
+        поэтому другие сохранения это не затрагивает.
+        """
+        if not objects:
+            return
+        field = model._meta.get_field(date_field)
+        field.auto_now_add = False
+        try:
+            model.objects.bulk_create(objects)
+        finally:
+            field.auto_now_add = True
@@ -0,0 +1,110 @@
+import glob
+import io
+import json
+import os
+import pstats
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from yatube.profiling import make_token
+
+ACTIONS = ('list', 'merge', 'summary', 'token')
+
+
+def template_frame(name):
+    return name.startswith(('template ', '{{', '{%'))
+
+
+class Command(BaseCommand):
+    help = ('Профили запросов из PROFILE_DIR: list - список, merge - '
+            'объединить в один .pstats и .collapsed, summary - самые '
+            'тяжёлые функции и места шаблонов, token - токен для '
+            'заголовка X-Profile')
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=ACTIONS)
+        parser.add_argument('--dir', default=settings.PROFILE_DIR,
+                            help='Папка с профилями')
+        parser.add_argument('--view', help='Только профили этого view')
+        parser.add_argument(
+            '--output', help='Путь без расширения для результата merge')
+        parser.add_argument(
+            '--sort', default='cumulative',
+            help='Сортировка функций в summary, как в pstats')
+        parser.add_argument('--limit', type=int, default=20)
+
+    def handle(self, *args, **options):
+        if options['action'] == 'token':
+            self.stdout.write(make_token())
+            return
+        profiles = self.profiles(options['dir'], options['view'])
+        if options['action'] == 'list':
+            self.list(profiles)
+            return
+        if not profiles:
+            raise CommandError('Профилей не найдено')
+        if options['action'] == 'merge':
+            self.merge(profiles, options['output'])
+        else:
+            self.summary(profiles, options['sort'], options['limit'])
+
+    @staticmethod
+    def profiles(directory, view):
+        """(описание, путь без расширения), по времени записи."""
+        profiles = []
+        for path in sorted(glob.glob(os.path.join(directory, '*.json'))):
+            with open(path, encoding='utf-8') as file:
+                meta = json.load(file)
+            if view is None or meta['view'] == view:
+                profiles.append((meta, path[:-len('.json')]))
+        return profiles
+
+    def list(self, profiles):
+        for meta, base in profiles:
+            self.stdout.write(
+                f'{meta["time"]}  {meta["view"]:<16} {meta["method"]:<4} '
+                f'{meta["status"]}  {meta["duration_ms"]:9.1f} мс  '
+                f'{meta["trigger"]:<6} {os.path.basename(base)}')
+        self.stdout.write(f'Профилей: {len(profiles)}')
+
+    @staticmethod
+    def stacks(profiles):
+        stacks = Counter()
+        for _, base in profiles:
+            with open(f'{base}.collapsed', encoding='utf-8') as file:
+                for line in file:
+                    stack, count = line.rstrip('\n').rsplit(' ', 1)
+                    stacks[stack] += int(count)
+        return stacks
+
+    def merge(self, profiles, output):
+        if not output:
+            raise CommandError('Укажите --output')
+        stats = pstats.Stats(*(f'{base}.pstats' for _, base in profiles))
+        stats.dump_stats(f'{output}.pstats')
+        with open(f'{output}.collapsed', 'w', encoding='utf-8') as file:
+            for stack, count in self.stacks(profiles).most_common():
+                file.write(f'{stack} {count}\n')
+        self.stdout.write(
+            f'Объединено профилей: {len(profiles)} в {output}.pstats и '
+            f'{output}.collapsed')
+
+    def summary(self, profiles, sort, limit):
+        stream = io.StringIO()
+        stats = pstats.Stats(
+            *(f'{base}.pstats' for _, base in profiles), stream=stream)
+        stats.strip_dirs().sort_stats(sort).print_stats(limit)
+        self.stdout.write(stream.getvalue())
+        stacks = self.stacks(profiles)
+        total = sum(stacks.values())
+        # Доля выборок, в которых место шаблона было в стеке.
+        places = Counter()
+        for stack, count in stacks.items():
+            for name in set(stack.split(';')):
+                if template_frame(name):
+                    places[name] += count
+        self.stdout.write(f'Места шаблонов, выборок всего: {total}')
+        for name, count in places.most_common(limit):
+            self.stdout.write(f'{count / total:7.1%}  {name}')
@@ -0,0 +1,96 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from posts.models import AuthorStats, Comment, Group, Post, User
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает хранимые счётчики записей и комментариев'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько строк проверять за один запрос')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        fixed = {
+            'posts': self.reconcile(
+                Post, 'comment_count', Comment, 'post_id', batch_size),
+            'groups': self.reconcile(
+                Group, 'posts_count', Post, 'group_id', batch_size),
+            'authors': self.reconcile_authors(batch_size),
+        }
+        self.stdout.write(
+            'Исправлено счётчиков: ' + ', '.join(
+                f'{name} - {count}' for name, count in fixed.items()))
+
+    @staticmethod
+    def batches(queryset, batch_size):
+        """Пачки объектов по возрастанию pk без OFFSET."""
+        last_pk = None
+        while True:
+            batch = queryset.order_by('pk')
+            if last_pk is not None:
+                batch = batch.filter(pk__gt=last_pk)
+            batch = list(batch[:batch_size])
+            if not batch:
+                return
+            yield batch
+            last_pk = batch[-1].pk
+
+    @staticmethod
+    def actual_counts(model, field, ids):
+        return dict(
+            model.objects.filter(**{f'{field}__in': ids}).order_by()
+            .values_list(field).annotate(count=Count('pk')))
+
+    def reconcile(self, model, counter, counted_model, field, batch_size):
+        fixed = 0
+        objects = model.objects.only('pk', counter)
+        for batch in self.batches(objects, batch_size):
+            with transaction.atomic():
+                ids = [obj.pk for obj in batch]
+                # Блокирует строки там, где это поддерживает база, чтобы
+                # сигналы не изменили счётчик между пересчётом и записью.
+                stored = dict(
+                    model.objects.select_for_update().filter(pk__in=ids)
+                    .values_list('pk', counter))
+                actual = self.actual_counts(counted_model, field, ids)
+                drifted = []
+                for obj in batch:
+                    count = actual.get(obj.pk, 0)
+                    if stored.get(obj.pk, count) != count:
+                        setattr(obj, counter, count)
+                        drifted.append(obj)
+                model.objects.bulk_update(drifted, [counter])
+                fixed += len(drifted)
+        return fixed
+
+    def reconcile_authors(self, batch_size):
+        fixed = 0
+        users = User.objects.only('pk')
+        for batch in self.batches(users, batch_size):
+            with transaction.atomic():
+                ids = [user.pk for user in batch]
+                stats = {
+                    stat.pk: stat for stat in AuthorStats.objects
+                    .select_for_update().filter(author_id__in=ids)
+                }
+                actual = self.actual_counts(Post, 'author_id', ids)
+                drifted, missing = [], []
+                for author_id in ids:
+                    count = actual.get(author_id, 0)
+                    stat = stats.get(author_id)
+                    if stat is None:
+                        if count:
+                            missing.append(AuthorStats(
+                                author_id=author_id, posts_count=count))
+                    elif stat.posts_count != count:
+                        stat.posts_count = count
+                        drifted.append(stat)
+                AuthorStats.objects.bulk_update(drifted, ['posts_count'])
+                AuthorStats.objects.bulk_create(missing)
+                fixed += len(drifted) + len(missing)
+        return fixed
@@ -0,0 +1,73 @@
+import glob
+import json
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = ('Сводка лога медленных запросов: запросы группируются по виду '
+            'SQL без параметров и сортируются по суммарному времени')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--log', default=settings.SLOW_QUERY_LOG,
+            help='Лог медленных запросов; ротированные части читаются тоже')
+        parser.add_argument(
+            '--view', help='Только запросы этого view (имя url)')
+        parser.add_argument(
+            '--limit', type=int, default=20,
+            help='Сколько видов запросов показать')
+
+    def handle(self, *args, **options):
+        # Сжатые logrotate части не читаются.
+        paths = sorted(
+            path for path in glob.glob(glob.escape(options['log']) + '*')
+            if not path.endswith('.gz'))
+        if not paths:
+            raise CommandError(f'Лог {options["log"]} не найден')
+        groups = {}
+        for entry in self.entries(paths):
+            if options['view'] and entry['view'] != options['view']:
+                continue
+            group = groups.setdefault(entry['shape'], {
+                'count': 0, 'total': 0.0, 'views': Counter(),
+                'slowest': entry})
+            group['count'] += 1
+            group['total'] += entry['duration_ms']
+            group['views'][entry['view'] or '-'] += 1
+            if entry['duration_ms'] > group['slowest']['duration_ms']:
+                group['slowest'] = entry
+        ranked = sorted(groups.items(), key=lambda item: -item[1]['total'])
+        for number, (shape, group) in enumerate(
+                ranked[:options['limit']], 1):
+            self.write_group(number, shape, group)
+        total = sum(group['count'] for group in groups.values())
+        self.stdout.write(
+            f'Видов запросов: {len(groups)}, записей: {total}')
+
+    def entries(self, paths):
+        for path in paths:
+            with open(path, encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        # Строка, оборванная при ротации или остановке.
+                        continue
+
+    def write_group(self, number, shape, group):
+        slowest = group['slowest']
+        views = ', '.join(f'{view} ({count})'
+                          for view, count in group['views'].most_common())
+        self.stdout.write(
+            f'{number}. {group["count"]} раз, всего {group["total"]:.1f} мс, '
+            f'среднее {group["total"] / group["count"]:.1f} мс, '
+            f'максимум {slowest["duration_ms"]:.1f} мс')
+        self.stdout.write(f'   view: {views}')
+        self.stdout.write(f'   {shape}')
+        if slowest['plan']:
+            self.stdout.write(f'   план: {"; ".join(slowest["plan"])}')
+        self.stdout.write(
+            f'   параметры самого медленного: {slowest["params"]}')
@@ -0,0 +1,12 @@
+from contextlib import contextmanager
+
+from django.db import transaction
+
+
+@contextmanager
+def rolled_back():
+    """Транзакция, которая всегда откатывается: данные для замеров
+    не остаются в базе."""
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
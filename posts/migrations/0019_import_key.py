@@ -0,0 +1,23 @@
+# Generated by Django 2.2.6 on 2026-10-18 14:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='import_key',
+            field=models.CharField(editable=False, max_length=100, null=True, unique=True, verbose_name='Ключ импорта'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='import_key',
+            field=models.CharField(editable=False, max_length=100, null=True, unique=True, verbose_name='Ключ импорта'),
+        ),
+    ]
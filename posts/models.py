@@ -1,10 +1,36 @@
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import models, transaction
+
+from .storage import post_image_storage
 
 User = get_user_model()
 
 
-class Group(models.Model):
+class CountersModel(models.Model):
+    """Модель, которая хранит счётчики или меняет чужие.
+
+    Счётчики из counter_fields меняются только через F() в сигналах,
+    поэтому обычное сохранение их не пишет и не затирает устаревшим
+    значением из памяти. Сохранение и обработчики post_save, которые
+    обновляют счётчики, выполняются в одной транзакции.
+    """
+    counter_fields = ()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+            ]
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+
+class Group(CountersModel):
     title = models.CharField(
         verbose_name='Название группы',
         max_length=200,
@@ -22,18 +48,34 @@ class Group(models.Model):
         verbose_name='Описание группы',
         help_text='Дайте описание группы'
     )
+    posts_count = models.PositiveIntegerField(
+        verbose_name='Количество записей',
+        default=0,
+        editable=False
+    )
+
+    counter_fields = ('posts_count',)
 
     def __str__(self):
         return self.title
 
 
-class Post(models.Model):
+class PostQuerySet(models.QuerySet):
+
+    def feed(self):
+        """Посты для ленты: автор и группа выбираются тем же запросом,
+        число комментариев хранится в самом посте."""
+        return self.select_related('author', 'group')
+
+
+class Post(CountersModel):
 
     text = models.TextField(
         verbose_name='Текст вашего поста',
         help_text='Содержание вашего поста'
     )
     pub_date = models.DateTimeField('date published', auto_now_add=True)
+    updated = models.DateTimeField('date updated', auto_now=True)
     author = models.ForeignKey(
         User,
         verbose_name='Автор',
@@ -48,16 +90,43 @@ class Post(models.Model):
         blank=True,
         null=True,
         related_name='posts')
-    image = models.ImageField(upload_to='posts/', blank=True, null=True)
+    image = models.ImageField(upload_to='posts/', storage=post_image_storage,
+                              blank=True, null=True)
+    comment_count = models.PositiveIntegerField(
+        verbose_name='Количество комментариев',
+        default=0,
+        editable=False
+    )
+    import_key = models.CharField(
+        verbose_name='Ключ импорта',
+        max_length=100,
+        unique=True,
+        null=True,
+        editable=False
+    )
+
+    objects = PostQuerySet.as_manager()
+
+    counter_fields = ('comment_count',)
 
     class Meta:
         ordering = ('-pub_date',)
+        indexes = (
+            # Ленты: фильтр (если есть) и keyset-диапазон по
+            # (pub_date, id) читаются одним проходом по индексу.
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_feed_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_feed_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_feed_idx'),
+        )
 
     def __str__(self):
         return self.text[0:15]
 
 
-class Comment(models.Model):
+class Comment(CountersModel):
 
     post = models.ForeignKey(
         Post,
@@ -72,9 +141,42 @@ class Comment(models.Model):
         verbose_name='Текст комментария',
         help_text='Добавьте комментарий')
     created = models.DateTimeField('date published', auto_now_add=True)
+    import_key = models.CharField(
+        verbose_name='Ключ импорта',
+        max_length=100,
+        unique=True,
+        null=True,
+        editable=False
+    )
 
     class Meta:
         ordering = ('-created',)
+        indexes = (
+            # Страницы комментариев поста: keyset по (created, id).
+            models.Index(fields=['post', '-created', '-id'],
+                         name='comment_post_feed_idx'),
+        )
 
     def __str__(self):
         return self.text[0:15]
+
+
+class AuthorStats(models.Model):
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats')
+    posts_count = models.PositiveIntegerField(
+        verbose_name='Количество записей',
+        default=0)
+
+    def __str__(self):
+        return f'{self.author}: {self.posts_count}'
+
+
+def author_posts_count(author):
+    try:
+        return author.stats.posts_count
+    except AuthorStats.DoesNotExist:
+        return 0
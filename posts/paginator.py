@@ -0,0 +1,176 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage, Page, Paginator
+from django.db.models import Q
+
+NEXT = 'n'
+PREVIOUS = 'p'
+# Наибольшее целое SQLite: OFFSET и LIMIT больше него база не примет.
+MAX_INTEGER = 2 ** 63 - 1
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+class CursorPage(Page):
+    """Страница keyset-пагинатора: знает только соседние курсоры."""
+
+    def __init__(self, object_list, paginator, has_next, has_previous,
+                 number=None):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return '<CursorPage %s>' % (self.previous_cursor or self.number)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def next_page_number(self):
+        raise InvalidPage('Use next_cursor for keyset pagination')
+
+    def previous_page_number(self):
+        raise InvalidPage('Use previous_cursor for keyset pagination')
+
+    @property
+    def next_cursor(self):
+        if not self._has_next or not self:
+            return None
+        return self.paginator.encode_cursor(NEXT, self[-1])
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous or not self:
+            return None
+        return self.paginator.encode_cursor(PREVIOUS, self[0])
+
+
+class CursorPaginator(Paginator):
+    """Keyset-пагинация по полям ordering вместо COUNT(*) и OFFSET.
+
+    Каждая страница выбирается одним запросом по диапазону индекса:
+    ``WHERE (pub_date, id) < (:pub_date, :id) ORDER BY ... LIMIT per_page+1``.
+    Лишняя строка показывает, есть ли страница дальше.
+    """
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-id')):
+        super().__init__(object_list, per_page)
+        self.ordering = tuple(ordering)
+        self.fields = tuple(name.lstrip('-') for name in self.ordering)
+
+    def encode_cursor(self, direction, obj):
+        model_fields = self.object_list.model._meta
+        values = [
+            model_fields.get_field(name).value_to_string(obj)
+            for name in self.fields
+        ]
+        raw = json.dumps([direction] + values, separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            direction, *values = json.loads(
+                base64.urlsafe_b64decode(padded.encode()).decode())
+            if not all(isinstance(value, str) for value in values):
+                raise TypeError('Cursor values must be strings')
+            model_fields = self.object_list.model._meta
+            values = [
+                model_fields.get_field(name).to_python(value)
+                for name, value in zip(self.fields, values)
+            ]
+        except (ValueError, TypeError, binascii.Error,
+                ValidationError) as error:
+            raise InvalidCursor('Invalid cursor') from error
+        if direction not in (NEXT, PREVIOUS) or (
+                len(values) != len(self.fields)):
+            raise InvalidCursor('Invalid cursor')
+        # Пустое значение или число вне диапазона SQLite ломают запрос.
+        if any(value is None or isinstance(value, int)
+               and abs(value) > MAX_INTEGER for value in values):
+            raise InvalidCursor('Invalid cursor')
+        return direction, values
+
+    def _after(self, values, ordering):
+        """Q для строк, идущих строго после values в порядке ordering."""
+        name = ordering[0].lstrip('-')
+        lookup = 'lt' if ordering[0].startswith('-') else 'gt'
+        strict = Q(**{f'{name}__{lookup}': values[0]})
+        if len(ordering) == 1:
+            return strict
+        rest = self._after(values[1:], ordering[1:])
+        # Нестрогая граница по первому полю даёт SQLite диапазон индекса.
+        return Q(**{f'{name}__{lookup}e': values[0]}) & (
+            strict | Q(**{name: values[0]}) & rest)
+
+    @staticmethod
+    def _reverse(ordering):
+        return tuple(
+            name[1:] if name.startswith('-') else f'-{name}'
+            for name in ordering)
+
+    def cursor_page(self, cursor=None):
+        queryset = self.object_list.order_by(*self.ordering)
+        if not cursor:
+            rows = list(queryset[:self.per_page + 1])
+            return CursorPage(rows[:self.per_page], self,
+                              has_next=len(rows) > self.per_page,
+                              has_previous=False, number=1)
+        direction, values = self.decode_cursor(cursor)
+        if direction == NEXT:
+            rows = list(queryset.filter(
+                self._after(values, self.ordering))[:self.per_page + 1])
+            return CursorPage(rows[:self.per_page], self,
+                              has_next=len(rows) > self.per_page,
+                              has_previous=True)
+        reverse = self._reverse(self.ordering)
+        rows = list(queryset.filter(self._after(values, reverse))
+                    .order_by(*reverse)[:self.per_page + 1])
+        page = rows[:self.per_page][::-1]
+        has_previous = len(rows) > self.per_page
+        return CursorPage(page, self, has_next=True,
+                          has_previous=has_previous,
+                          number=None if has_previous else 1)
+
+    def _offset_rows(self, number):
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page + 1
+        if top > MAX_INTEGER:
+            return []
+        return list(self.object_list.order_by(*self.ordering)[bottom:top])
+
+    def offset_page(self, number):
+        """Совместимость со старыми ссылками ?page=N без COUNT(*).
+
+        Номер за концом ленты, как в Paginator.get_page, открывает
+        последнюю страницу; COUNT(*) считается только в этом случае.
+        """
+        try:
+            number = max(int(number), 1)
+        except (TypeError, ValueError):
+            number = 1
+        rows = self._offset_rows(number)
+        if not rows and number > 1:
+            number = self.num_pages
+            rows = self._offset_rows(number)
+        return CursorPage(rows[:self.per_page], self,
+                          has_next=len(rows) > self.per_page,
+                          has_previous=number > 1, number=number)
+
+    def get_cursor_page(self, cursor=None, number=None):
+        if cursor:
+            try:
+                return self.cursor_page(cursor)
+            except InvalidCursor:
+                return self.cursor_page()
+        if number:
+            return self.offset_page(number)
+        return self.cursor_page()
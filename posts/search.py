@@ -0,0 +1,196 @@
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+
+from django.db import DatabaseError, connection, connections
+
+from .models import Comment, Post
+
+TOKEN_RE = re.compile(r'\w+')
+
+# Индексируемые модели: имя таблицы FTS5 строится из db_table.
+INDEXED_MODELS = (Post, Comment)
+
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or '').lower())
+
+
+def fts_table(model):
+    return f'{model._meta.db_table}_fts'
+
+
+class FTS5Backend:
+    """Полнотекстовый поиск на виртуальных таблицах SQLite FTS5.
+
+    Таблицы FTS5 ссылаются на таблицы моделей (external content),
+    а триггеры синхронизируют их при любых INSERT/UPDATE/DELETE,
+    включая bulk_create и сырой SQL.
+    """
+
+    TRIGGERS = (
+        ('ai', 'AFTER INSERT ON {table} BEGIN '
+               'INSERT INTO {fts}(rowid, text) VALUES (new.id, new.text); '
+               'END'),
+        ('ad', 'AFTER DELETE ON {table} BEGIN '
+               "INSERT INTO {fts}({fts}, rowid, text) "
+               "VALUES ('delete', old.id, old.text); "
+               'END'),
+        ('au', 'AFTER UPDATE OF text ON {table} BEGIN '
+               "INSERT INTO {fts}({fts}, rowid, text) "
+               "VALUES ('delete', old.id, old.text); "
+               'INSERT INTO {fts}(rowid, text) VALUES (new.id, new.text); '
+               'END'),
+    )
+
+    @staticmethod
+    def is_available(using_connection):
+        if using_connection.vendor != 'sqlite':
+            return False
+        with using_connection.cursor() as cursor:
+            try:
+                cursor.execute(
+                    'CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(text)')
+                cursor.execute('DROP TABLE temp.fts5_probe')
+            except DatabaseError:
+                return False
+        return True
+
+    def install(self, using_connection):
+        """Создаёт таблицы FTS5 и триггеры, если их ещё нет.
+
+        Вызывается после каждой миграции: пересоздание таблицы модели
+        в SQLite (AddField, AlterField) удаляет её триггеры.
+        """
+        with using_connection.cursor() as cursor:
+            for model in INDEXED_MODELS:
+                table, fts = model._meta.db_table, fts_table(model)
+                cursor.execute(
+                    "SELECT 1 FROM sqlite_master WHERE name = %s", [fts])
+                created = cursor.fetchone() is None
+                if created:
+                    cursor.execute(
+                        f'CREATE VIRTUAL TABLE {fts} USING fts5('
+                        f"text, content='{table}', content_rowid='id', "
+                        f"tokenize='unicode61 remove_diacritics 2')")
+                for suffix, body in self.TRIGGERS:
+                    cursor.execute(
+                        f'CREATE TRIGGER IF NOT EXISTS {fts}_{suffix} '
+                        + body.format(table=table, fts=fts))
+                if created:
+                    cursor.execute(
+                        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+    def update(self, model, pk, text):
+        pass
+
+    def remove(self, model, pk):
+        pass
+
+    def search(self, model, query, offset=0, limit=20):
+        terms = tokenize(query)
+        if not terms:
+            return []
+        match = ' '.join('"%s"' % term for term in terms)
+        fts = fts_table(model)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {fts} WHERE {fts} MATCH %s '
+                'ORDER BY rank LIMIT %s OFFSET %s',
+                [match, limit, offset])
+            return [row[0] for row in cursor.fetchall()]
+
+
+class InvertedIndexBackend:
+    """Запасной поиск для баз без FTS5: инвертированный индекс в памяти.
+
+    Индекс строится из БД при первом поиске и дальше обновляется
+    сигналами, поэтому видит только записи, сделанные этим процессом
+    после построения. Ранжирование - TF-IDF по словам запроса.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings = {}
+        self._documents = {}
+
+    def _ensure(self, model):
+        if model in self._postings:
+            return
+        self._postings[model] = defaultdict(dict)
+        self._documents[model] = {}
+        rows = model.objects.order_by().values_list('pk', 'text')
+        for pk, text in rows.iterator():
+            self._add(model, pk, text)
+
+    def _add(self, model, pk, text):
+        tokens = Counter(tokenize(text))
+        self._documents[model][pk] = (sum(tokens.values()), set(tokens))
+        for term, count in tokens.items():
+            self._postings[model][term][pk] = count
+
+    def _remove(self, model, pk):
+        postings = self._postings[model]
+        _, terms = self._documents[model].pop(pk, (0, ()))
+        for term in terms:
+            postings[term].pop(pk, None)
+            if not postings[term]:
+                del postings[term]
+
+    def update(self, model, pk, text):
+        with self._lock:
+            if model in self._postings:
+                self._remove(model, pk)
+                self._add(model, pk, text)
+
+    def remove(self, model, pk):
+        with self._lock:
+            if model in self._postings:
+                self._remove(model, pk)
+
+    def search(self, model, query, offset=0, limit=20):
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+        with self._lock:
+            self._ensure(model)
+            documents = self._documents[model]
+            matches = [
+                self._postings[model].get(term, {}) for term in terms]
+            if not all(matches):
+                return []
+            found = set.intersection(*(set(docs) for docs in matches))
+            scores = Counter()
+            for docs in matches:
+                idf = math.log(1 + len(documents) / len(docs))
+                for pk in found:
+                    scores[pk] += docs[pk] / (documents[pk][0] or 1) * idf
+        ranked = sorted(scores, key=lambda pk: (-scores[pk], -pk))
+        return ranked[offset:offset + limit]
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if FTS5Backend.is_available(connection):
+                _backend = FTS5Backend()
+            else:
+                _backend = InvertedIndexBackend()
+    return _backend
+
+
+def search(model, query, offset=0, limit=20):
+    """id объектов model, подходящих под query, по убыванию релевантности."""
+    return get_backend().search(model, query, offset, limit)
+
+
+def install_search_index(sender, using, **kwargs):
+    using_connection = connections[using]
+    if FTS5Backend.is_available(using_connection):
+        FTS5Backend().install(using_connection)
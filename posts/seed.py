@@ -0,0 +1,234 @@
+import random
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from io import BytesIO
+from itertools import accumulate, islice
+
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.db.models import Max
+from PIL import Image
+
+from .models import AuthorStats, Comment, Group, Post, User
+from .search import fts_table
+
+WORDS = ('день', 'город', 'кот', 'книга', 'море', 'кофе', 'дорога',
+         'музыка', 'дождь', 'друг', 'работа', 'лето', 'утро', 'фото')
+# Неиспользуемый пароль, как у make_password(None), но без случайности.
+UNUSABLE_PASSWORD = '!seed'
+# Даты пишутся в базу как есть: наивные, в UTC.
+START = datetime(2020, 1, 1)
+TEXTS = 1000
+# Промежутки между постами, с: затишье, всплеск, вероятность смены.
+POST_GAPS = (600, 20, 0.02)
+COMMENT_GAPS = (1800, 30, 0.05)
+# Показатели степенных распределений: популярность авторов и групп,
+# длина веток (Парето с тяжёлым хвостом, среднее 1 / (alpha - 1)).
+AUTHOR_EXPONENT = 1.1
+GROUP_EXPONENT = 0.8
+THREAD_ALPHA = 1.2
+MAX_THREAD = 20000
+
+
+def placeholder_image(color, size=(960, 540)):
+    buffer = BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+def placeholder_images(count, rng):
+    """Разноцветные JPEG в хранилище картинок постов.
+
+    Хранилище именует файлы по содержимому, поэтому тот же seed даёт
+    те же пути.
+    """
+    storage = Post._meta.get_field('image').storage
+    return [
+        storage.save('posts/seed.jpg', ContentFile(placeholder_image(
+            tuple(rng.randrange(256) for _ in range(3)))))
+        for _ in range(count)
+    ]
+
+
+def text(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def zipf_weights(count, exponent):
+    """Накопленные веса: k-й по популярности встречается как 1 / k^s."""
+    return list(accumulate(rank ** -exponent for rank in range(1, count + 1)))
+
+
+def bursty_offsets(rng, start, gaps):
+    """Бесконечные моменты событий в секундах от start: долгие
+    затишья чередуются со всплесками частых событий."""
+    quiet, burst, switch = gaps
+    moment, bursting = start, False
+    while True:
+        if rng.random() < switch:
+            bursting = not bursting
+        moment += rng.expovariate(1 / (burst if bursting else quiet))
+        yield moment
+
+
+def draws(rng, population, cum_weights=None, chunk=65536):
+    """Бесконечный поток случайных элементов: choices пачками намного
+    быстрее отдельных вызовов."""
+    while True:
+        yield from rng.choices(population, cum_weights=cum_weights, k=chunk)
+
+
+def next_pk(model):
+    return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+
+@contextmanager
+def deferred_indexes(*models):
+    """Снимает вторичные индексы и триггеры таблиц SQLite на время
+    вставки и создаёт их заново.
+
+    Индекс по готовым данным строится быстрее, чем обновляется на
+    каждой строке; индекс FTS5 вместо триггеров перестраивается целиком.
+    """
+    if connection.vendor != 'sqlite':
+        yield
+        return
+    tables = [model._meta.db_table for model in models]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT type, name, sql FROM sqlite_master '
+            "WHERE type IN ('index', 'trigger') AND sql IS NOT NULL "
+            f'AND tbl_name IN ({", ".join(["%s"] * len(tables))})', tables)
+        objects = cursor.fetchall()
+        for kind, name, _ in objects:
+            cursor.execute(f'DROP {kind.upper()} {name}')
+    yield
+    with connection.cursor() as cursor:
+        for _, _, sql in objects:
+            cursor.execute(sql)
+        for model in models:
+            fts = fts_table(model)
+            cursor.execute(
+                'SELECT 1 FROM sqlite_master WHERE name = %s', [fts])
+            if cursor.fetchone():
+                cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def insert(model, fields, rows, batch_size):
+    """INSERT через executemany пачками, без моделей и сигналов."""
+    meta = model._meta
+    columns = ', '.join(connection.ops.quote_name(meta.get_field(name).column)
+                        for name in fields)
+    sql = (f'INSERT INTO {connection.ops.quote_name(meta.db_table)} '
+           f'({columns}) VALUES ({", ".join(["%s"] * len(fields))})')
+    rows = iter(rows)
+    count = 0
+    with connection.cursor() as cursor:
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                return count
+            cursor.executemany(sql, batch)
+            count += len(batch)
+
+
+def seed(posts, comments_per_post=3, image_ratio=0.2, seed_value=0,
+         batch_size=10000, users=None, groups=None, images=10):
+    """Создаёт детерминированный набор данных для замеров и нагрузки.
+
+    Авторы и группы выбираются по степенному закону, посты и
+    комментарии идут всплесками, длина веток комментариев - с тяжёлым
+    хвостом. Строки вставляются сырым SQL, сигналы не срабатывают:
+    счётчики заполняются сразу. Транзакцией управляет вызывающий.
+    Возвращает число строк и самые нагруженные объекты: группу,
+    автора и пост.
+    """
+    rng = random.Random(seed_value)
+    users = users or max(posts // 20, 10)
+    groups = groups or max(posts // 1000, 5)
+    prefix = f'seed-{seed_value}'
+    # Даты строками, как их хранит SQLite: так быстрее адаптеров Django.
+    joined = START.isoformat(' ')
+    first_user = next_pk(User)
+    user_ids = range(first_user, first_user + users)
+    rows = insert(User, (
+        'id', 'password', 'is_superuser', 'username', 'first_name',
+        'last_name', 'email', 'is_staff', 'is_active', 'date_joined',
+    ), (
+        (pk, UNUSABLE_PASSWORD, False, f'{prefix}-{index}', '', '', '',
+         False, True, joined)
+        for index, pk in enumerate(user_ids)
+    ), batch_size)
+    first_group = next_pk(Group)
+    group_ids = range(first_group, first_group + groups)
+    rows += insert(Group, (
+        'id', 'title', 'slug', 'description', 'posts_count',
+    ), (
+        (pk, f'Группа {index}', f'{prefix}-{index}', text(rng, 8), 0)
+        for index, pk in enumerate(group_ids)
+    ), batch_size)
+    texts = draws(rng, [text(rng, rng.randint(5, 60))
+                        for _ in range(TEXTS)])
+    replies = draws(rng, [text(rng, rng.randint(2, 20))
+                          for _ in range(TEXTS)])
+    pictures = placeholder_images(images, rng) if image_ratio else []
+    authors = draws(rng, user_ids, zipf_weights(users, AUTHOR_EXPONENT))
+    group_draws = draws(rng, group_ids, zipf_weights(groups, GROUP_EXPONENT))
+    thread_scale = comments_per_post * (THREAD_ALPHA - 1)
+
+    first_post = next_pk(Post)
+    post_counts, group_counts, threads = {}, {}, []
+
+    def post_rows():
+        moments = bursty_offsets(rng, 0, POST_GAPS)
+        for pk in range(first_post, first_post + posts):
+            author = next(authors)
+            group = next(group_draws) if rng.random() < 0.8 else None
+            comments = min(int((rng.paretovariate(THREAD_ALPHA) - 1)
+                               * thread_scale), MAX_THREAD)
+            created = START + timedelta(seconds=next(moments))
+            threads.append((pk, author, created, comments))
+            post_counts[author] = post_counts.get(author, 0) + 1
+            if group is not None:
+                group_counts[group] = group_counts.get(group, 0) + 1
+            image = (rng.choice(pictures)
+                     if pictures and rng.random() < image_ratio else '')
+            date = created.isoformat(' ')
+            yield (pk, next(texts), date, date, author, group, image,
+                   comments)
+
+    def comment_rows():
+        pk = next_pk(Comment)
+        for post, _, created, count in threads:
+            moments = bursty_offsets(rng, 0, COMMENT_GAPS)
+            for _ in range(count):
+                date = created + timedelta(seconds=next(moments))
+                yield (pk, post, next(authors), next(replies),
+                       date.isoformat(' '))
+                pk += 1
+
+    with deferred_indexes(Post, Comment):
+        rows += insert(Post, (
+            'id', 'text', 'pub_date', 'updated', 'author', 'group', 'image',
+            'comment_count',
+        ), post_rows(), batch_size)
+        rows += insert(Comment, ('id', 'post', 'author', 'text', 'created'),
+                       comment_rows(), batch_size)
+    rows += insert(AuthorStats, ('author', 'posts_count'),
+                   post_counts.items(), batch_size)
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'UPDATE {Group._meta.db_table} SET posts_count = %s '
+            'WHERE id = %s',
+            [(count, pk) for pk, count in group_counts.items()])
+
+    top_author = max(post_counts, key=post_counts.get)
+    top_post = max(threads, key=lambda thread: thread[3])
+    return {
+        'rows': rows,
+        'group': Group.objects.get(pk=max(
+            group_ids, key=lambda pk: group_counts.get(pk, 0))).slug,
+        'author': User.objects.get(pk=top_author).username,
+        'post': top_post[0],
+        'post_author': User.objects.get(pk=top_post[1]).username,
+    }
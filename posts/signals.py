@@ -0,0 +1,159 @@
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .cache import (FEED_GENERATION_KEY, GROUP_GENERATION_KEY,
+                    POST_GENERATION_KEY, SITE_GENERATION_KEY,
+                    author_generation_key, bump_author_version,
+                    bump_generations, bump_group_version, bump_post_version,
+                    forget_post_version)
+from .models import AuthorStats, Comment, Group, Post, User
+from .search import get_backend as search_backend
+
+
+def post_generation_keys(post, group_ids=()):
+    """Поколения страниц, на которых виден пост."""
+    keys = {
+        FEED_GENERATION_KEY,
+        author_generation_key(post.author.username),
+        POST_GENERATION_KEY.format(post_id=post.pk),
+    }
+    group_ids = {post.group_id, *group_ids} - {None}
+    for slug in Group.objects.filter(pk__in=group_ids).values_list(
+            'slug', flat=True):
+        keys.add(GROUP_GENERATION_KEY.format(slug=slug))
+    return keys
+
+
+@receiver(pre_save, sender=Post)
+def post_saving(sender, instance, **kwargs):
+    # Пост мог уйти из группы: её страницу тоже нужно обновить.
+    instance.previous_group_ids = list(
+        Post.objects.filter(pk=instance.pk).values_list(
+            'group_id', flat=True)) if instance.pk else []
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, **kwargs):
+    bump_post_version(instance.pk)
+    bump_generations(post_generation_keys(
+        instance, getattr(instance, 'previous_group_ids', ())))
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    forget_post_version(instance.pk)
+    bump_generations(post_generation_keys(instance))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_changed(sender, instance, **kwargs):
+    bump_post_version(instance.post_id)
+    post = Post.objects.select_related('author').filter(
+        pk=instance.post_id).first()
+    if post is None:
+        # Комментарий удаляется каскадом вместе с постом.
+        return
+    bump_generations(post_generation_keys(post))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    # Название группы есть на карточках всех лент, поэтому меняется
+    # поколение всего сайта.
+    bump_group_version(instance.pk)
+    bump_generations([SITE_GENERATION_KEY])
+
+
+# Поля пользователя, которые видны на карточках и в профиле.
+AUTHOR_FIELDS = ('username', 'first_name', 'last_name')
+
+
+@receiver(pre_save, sender=User)
+def user_saving(sender, instance, update_fields=None, **kwargs):
+    # Вход сохраняет только last_login: тогда сравнивать нечего.
+    instance.previous_author = None
+    if instance.pk and (update_fields is None
+                        or set(update_fields) & set(AUTHOR_FIELDS)):
+        instance.previous_author = User.objects.filter(
+            pk=instance.pk).values_list(*AUTHOR_FIELDS).first()
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, **kwargs):
+    previous = getattr(instance, 'previous_author', None)
+    if previous is None or previous == tuple(
+            getattr(instance, field) for field in AUTHOR_FIELDS):
+        return
+    # Имя автора есть на карточках всех лент, а старое имя - в адресе
+    # профиля, поэтому меняется поколение всего сайта.
+    bump_author_version(instance.pk)
+    bump_generations([SITE_GENERATION_KEY])
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Comment)
+def text_saved(sender, instance, **kwargs):
+    search_backend().update(sender, instance.pk, instance.text)
+
+
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=Comment)
+def text_deleted(sender, instance, **kwargs):
+    search_backend().remove(sender, instance.pk)
+
+
+def change_counter(queryset, field, delta):
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gt': 0})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def change_author_posts_count(author_id, delta):
+    stats = AuthorStats.objects.filter(author_id=author_id)
+    if change_counter(stats, 'posts_count', delta) or delta < 0:
+        return
+    _, created = AuthorStats.objects.get_or_create(
+        author_id=author_id, defaults={'posts_count': delta})
+    if not created:
+        change_counter(AuthorStats.objects.filter(author_id=author_id),
+                       'posts_count', delta)
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = set(getattr(instance, 'previous_group_ids', ())) - {None}
+    current = {instance.group_id} - {None}
+    if created:
+        change_author_posts_count(instance.author_id, 1)
+        previous = set()
+    groups = Group.objects.filter
+    for group_id in previous - current:
+        change_counter(groups(pk=group_id), 'posts_count', -1)
+    for group_id in current - previous:
+        change_counter(groups(pk=group_id), 'posts_count', 1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    change_author_posts_count(instance.author_id, -1)
+    if instance.group_id:
+        change_counter(Group.objects.filter(pk=instance.group_id),
+                       'posts_count', -1)
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        change_counter(Post.objects.filter(pk=instance.post_id),
+                       'comment_count', 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    change_counter(Post.objects.filter(pk=instance.post_id),
+                   'comment_count', -1)
@@ -0,0 +1,57 @@
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+HASHED_NAME_PATTERN = r'[0-9a-f]{2}/[0-9a-f]{64}\.\w+'
+# umask процесса читается один раз при импорте: os.umask меняет её
+# для всех потоков.
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Файловое хранилище, где имя файла - sha256 его содержимого.
+
+    Одинаковые картинки хранятся один раз, а файл по имени никогда не
+    меняется, поэтому его можно отдавать с Cache-Control: immutable.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        digest = digest.hexdigest()
+        extension = os.path.splitext(name)[1].lower()
+        name = posixpath.join(
+            posixpath.dirname(name), digest[:2], digest + extension)
+        return self._save(name, content)
+
+    def _save(self, name, content):
+        full_path = self.path(name)
+        if os.path.exists(full_path):
+            return name
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+        # Пишем во временный файл и атомарно переименовываем: параллельная
+        # загрузка той же картинки запишет тот же самый файл.
+        with tempfile.NamedTemporaryFile(dir=directory, delete=False) as tmp:
+            for chunk in content.chunks():
+                tmp.write(chunk)
+        # NamedTemporaryFile создаёт файл с правами 0600; без настройки
+        # права как у FileSystemStorage, иначе веб-сервер не прочитает.
+        mode = self.file_permissions_mode
+        os.chmod(tmp.name, 0o666 & ~UMASK if mode is None else mode)
+        os.replace(tmp.name, full_path)
+        return name
+
+
+post_image_storage = ContentAddressedStorage()
@@ -0,0 +1,29 @@
+from django import template
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from posts.cache import post_card_key, prefetch_post_cards as prefetch
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def prefetch_post_cards(context, posts):
+    prefetch(posts, context.get('user'))
+    return ''
+
+
+@register.simple_tag(takes_context=True)
+def post_card(context, post):
+    user = context.get('user')
+    key = post_card_key(post, user)
+    cards = getattr(post, 'cached_cards', None)
+    # Без prefetch_post_cards карточка читается из кеша по одной;
+    # после него промах в словаре - это промах и в кеше.
+    html = cache.get(key) if cards is None else cards.get(key)
+    if html is None:
+        html = render_to_string('include/post_item.html',
+                                {'post': post, 'user': user})
+        cache.set(key, html, None)
+    return mark_safe(html)
@@ -0,0 +1,104 @@
+import base64
+import json
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post, User
+from posts.tests.utils import run_on_commit
+from yatube.settings import POSTS_PER_PAGE
+
+
+class FeedApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='api-author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='api-group', description='Описание')
+        cls.posts = [
+            Post.objects.create(text=f'Пост {index}', author=cls.user,
+                                group=cls.group)
+            for index in range(POSTS_PER_PAGE + 1)
+        ]
+        cls.comment = Comment.objects.create(
+            post=cls.posts[0], author=cls.user, text='Комментарий')
+
+    def setUp(self):
+        cache.clear()
+
+    def urls(self):
+        return (
+            reverse('api:index'),
+            reverse('api:group_posts', args=[self.group.slug]),
+            reverse('api:profile', args=[self.user.username]),
+            reverse('api:post', args=[self.user.username,
+                                      self.posts[0].pk]),
+        )
+
+    def test_feed_pages(self):
+        """Лента отдаёт посты страницами со ссылкой на следующую"""
+        data = self.client.get(reverse('api:index')).json()
+        self.assertEqual(len(data['results']), POSTS_PER_PAGE)
+        self.assertEqual(data['results'][0]['id'], self.posts[-1].pk)
+        self.assertIsNone(data['previous'])
+        rest = self.client.get(data['next']).json()
+        self.assertEqual([post['id'] for post in rest['results']],
+                         [self.posts[0].pk])
+        self.assertEqual(rest['results'][0]['comment_count'], 1)
+
+    def test_malformed_cursor_shows_first_page(self):
+        """Курсор с пустыми или огромными значениями открывает начало"""
+        pub_date = self.posts[0].pub_date.isoformat()
+        for values in (['n', None, None], ['n', pub_date, str(10 ** 30)],
+                       ['n', pub_date, 10 ** 30], ['p', 1, 2]):
+            with self.subTest(values=values):
+                cursor = base64.urlsafe_b64encode(
+                    json.dumps(values).encode()).decode()
+                response = self.client.get(reverse('api:index'),
+                                           {'cursor': cursor})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json()['results'][0]['id'],
+                                 self.posts[-1].pk)
+
+    def test_post_with_comments(self):
+        data = self.client.get(self.urls()[3]).json()
+        self.assertEqual(data['post']['id'], self.posts[0].pk)
+        self.assertEqual(data['results'][0]['text'], self.comment.text)
+
+    def test_not_modified_without_rendering(self):
+        """С актуальным ETag ответ 304 после одного запроса к базе"""
+        for url in self.urls():
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(
+                        url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(len(queries), 1)
+
+    def test_changes_update_etag(self):
+        """Правка поста и новый комментарий меняют ETag"""
+        etags = {url: self.client.get(url)['ETag'] for url in self.urls()}
+        self.posts[0].text = 'Исправленный текст'
+        with run_on_commit():
+            self.posts[0].save()
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+        url = self.urls()[3]
+        response = self.client.get(url)
+        with run_on_commit():
+            Comment.objects.create(
+                post=self.posts[0], author=self.user, text='Ещё один')
+        self.assertEqual(self.client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_unknown_group(self):
+        response = self.client.get(
+            reverse('api:group_posts', args=['missing']))
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,330 @@
+import cProfile
+import gzip
+import json
+import os
+import pstats
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from sorl.thumbnail import default
+
+from posts.management.rollback import rolled_back
+from posts.models import AuthorStats, Comment, Group, Post, User
+from posts.search import search
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class GenerateThumbnailsCommandTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='thumb-author')
+        cls.post = Post.objects.create(
+            text='Пост с картинкой',
+            author=cls.user,
+            image=SimpleUploadedFile(
+                name='small.gif', content=SMALL_GIF,
+                content_type='image/gif'))
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        default.kvstore.clear_local()
+
+    def test_command_creates_thumbnails(self):
+        """Команда создаёт миниатюры для картинок постов"""
+        out = StringIO()
+        call_command('generate_thumbnails', workers=1, stdout=out)
+        thumbnails = [
+            name for _, _, names in os.walk(
+                os.path.join(TEMP_MEDIA_ROOT, 'cache'))
+            for name in names
+        ]
+        self.assertEqual(len(thumbnails), len(settings.THUMBNAIL_PRESETS))
+        self.assertIn('для 1 картинок, ошибок: 0', out.getvalue())
+
+
+class ReconcileCountersCommandTest(TestCase):
+    def test_fixes_drifted_counters(self):
+        """Команда находит и исправляет разошедшиеся счётчики."""
+        user = User.objects.create_user(username='drift-author')
+        group = Group.objects.create(
+            title='Группа', slug='drift', description='Описание')
+        posts = [
+            Post.objects.create(text=f'Пост {i}', author=user, group=group)
+            for i in range(3)
+        ]
+        Comment.objects.create(post=posts[0], author=user, text='Ок')
+        Post.objects.filter(pk=posts[0].pk).update(comment_count=7)
+        Group.objects.filter(pk=group.pk).update(posts_count=0)
+        AuthorStats.objects.filter(author=user).delete()
+        out = StringIO()
+        call_command('reconcile_counters', batch_size=2, stdout=out)
+        self.assertIn('posts - 1, groups - 1, authors - 1', out.getvalue())
+        posts[0].refresh_from_db()
+        group.refresh_from_db()
+        self.assertEqual(posts[0].comment_count, 1)
+        self.assertEqual(group.posts_count, 3)
+        self.assertEqual(AuthorStats.objects.get(author=user).posts_count, 3)
+        out = StringIO()
+        call_command('reconcile_counters', stdout=out)
+        self.assertIn('posts - 0, groups - 0, authors - 0', out.getvalue())
+
+
+class BenchmarkGroupFeedCommandTest(TestCase):
+    def test_benchmark_rolls_back_data(self):
+        """Замер печатает результаты и не оставляет созданных записей."""
+        out = StringIO()
+        call_command('benchmark_group_feed', sizes=[30, 60], repeat=2,
+                     max_ratio=100, stdout=out)
+        self.assertIn('Рост медианы', out.getvalue())
+        self.assertFalse(Post.objects.exists())
+        self.assertFalse(Group.objects.exists())
+
+
+class BenchmarkViewsCommandTest(TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+
+    def benchmark(self, *args):
+        call_command('benchmark_views', '--sizes', '40', '--requests', '2',
+                     '--warmup', '0', *args, stdout=StringIO(),
+                     stderr=StringIO())
+
+    def test_writes_baseline_and_rolls_back(self):
+        """Результаты пишутся в JSON, созданные записи откатываются."""
+        path = os.path.join(self.folder, 'baseline.json')
+        users = User.objects.count()
+        self.benchmark('--output', path)
+        with open(path) as file:
+            results = json.load(file)['results']['40']
+        self.assertIn('new_post', results)
+        self.assertEqual(set(results['index']),
+                         {'p50', 'p95', 'p99', 'queries', 'peak_memory_kb'})
+        self.assertFalse(Post.objects.exists())
+        self.assertEqual(User.objects.count(), users)
+
+    def test_compare_reports_regression(self):
+        """Рост метрик сверх порога относительно базы - ошибка."""
+        path = os.path.join(self.folder, 'baseline.json')
+        self.benchmark('--output', path)
+        with open(path) as file:
+            report = json.load(file)
+        report['results']['40']['index']['queries'] = 0.1
+        with open(path, 'w') as file:
+            json.dump(report, file)
+        with self.assertRaisesMessage(CommandError, 'Регрессий: 1'):
+            self.benchmark('--compare', path, '--threshold', '10')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class SeedCommandTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def seed(self):
+        out = StringIO()
+        call_command('seed', '--posts', '200', '--seed', '7', stdout=out)
+        self.assertIn('строк/с', out.getvalue())
+
+    @staticmethod
+    def snapshot():
+        return (
+            list(User.objects.values_list('username', 'date_joined')),
+            list(Group.objects.values_list('slug', 'posts_count')),
+            list(Post.objects.values_list(
+                'text', 'author__username', 'group__slug', 'pub_date',
+                'image', 'comment_count')),
+            list(Comment.objects.values_list(
+                'post_id', 'author__username', 'text', 'created')),
+        )
+
+    def test_same_seed_gives_same_data(self):
+        """Один и тот же seed на пустой базе даёт одинаковые данные."""
+        snapshots = []
+        for _ in range(2):
+            with rolled_back():
+                self.seed()
+                snapshots.append(self.snapshot())
+        self.assertEqual(snapshots[0], snapshots[1])
+        self.assertEqual(len(snapshots[0][2]), 200)
+
+    def test_counters_and_search_index(self):
+        """Счётчики сходятся, поисковый индекс содержит новые посты."""
+        self.seed()
+        self.assertTrue(Comment.objects.exists())
+        out = StringIO()
+        call_command('reconcile_counters', stdout=out)
+        self.assertIn('posts - 0, groups - 0, authors - 0', out.getvalue())
+        expected = {
+            pk for pk, text in Post.objects.values_list('pk', 'text')
+            if 'кот' in text.lower().split()
+        }
+        self.assertTrue(expected)
+        self.assertEqual(set(search(Post, 'кот', limit=len(expected) + 1)),
+                         expected)
+
+
+class ImportPostsCommandTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def jsonl(self, *records):
+        return self.write('data.jsonl', ''.join(
+            json.dumps(record) + '\n' for record in records))
+
+    def test_import_jsonl_twice(self):
+        """Импорт сохраняет даты и счётчики, повторный ничего не дублирует."""
+        path = self.jsonl(
+            {'type': 'group', 'slug': 'imported', 'title': 'Импорт'},
+            {'type': 'post', 'id': 1, 'author': 'old-author',
+             'group': 'imported', 'text': 'Первый',
+             'pub_date': '2015-05-01T10:00:00'},
+            {'type': 'post', 'id': 2, 'author': 'old-author',
+             'text': 'Второй'},
+            {'type': 'comment', 'id': 1, 'post': 1, 'author': 'reader',
+             'text': 'Комментарий', 'created': '2015-05-02T10:00:00'},
+            {'type': 'comment', 'id': 2, 'post': 404, 'author': 'reader',
+             'text': 'Потерянный'},
+        )
+        out = StringIO()
+        call_command('import_posts', path, batch_size=2, stdout=out)
+        self.assertIn('постов: 2, комментариев: 1', out.getvalue())
+        self.assertIn('ошибок: 1', out.getvalue())
+        post = Post.objects.get(import_key='import:1')
+        self.assertEqual(post.pub_date.year, 2015)
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(post.group.posts_count, 1)
+        self.assertEqual(post.author.stats.posts_count, 2)
+        self.assertFalse(post.author.has_usable_password())
+        out = StringIO()
+        call_command('import_posts', path, stdout=out)
+        self.assertIn('постов: 0, комментариев: 0, уже были: 4',
+                      out.getvalue())
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertFalse(os.path.exists(path + '.checkpoint'))
+
+    def test_resume_from_checkpoint(self):
+        """Записи до отметки в файле checkpoint пропускаются."""
+        path = self.write(
+            'data.csv',
+            'type,id,author,text,pub_date\n'
+            'post,1,csv-author,Пропущенный,\n'
+            'post,2,csv-author,Импортированный,2019-01-01 12:00:00\n')
+        self.write('data.csv.checkpoint', '1')
+        call_command('import_posts', path, stdout=StringIO())
+        self.assertEqual(
+            list(Post.objects.values_list('text', flat=True)),
+            ['Импортированный'])
+
+
+class SlowQueriesCommandTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.log = os.path.join(self.directory, 'slow.jsonl')
+
+    def entry(self, sql, duration, view, params):
+        return json.dumps({
+            'duration_ms': duration, 'view': view, 'sql': sql,
+            'shape': sql, 'params': params, 'plan': ['SCAN posts_post']})
+
+    def test_groups_by_shape(self):
+        """Запросы одного вида из всех частей лога сводятся вместе."""
+        feed = 'SELECT * FROM posts_post WHERE group_id = %s'
+        with open(self.log, 'w') as file:
+            file.write(self.entry(feed, 120, 'group_posts', [1]) + '\n')
+            file.write(self.entry('SELECT 1', 500, None, []) + '\n')
+            file.write('{"обрыв\n')
+        with open(self.log + '.1', 'w') as file:
+            file.write(self.entry(feed, 450, 'group_posts', [2]) + '\n')
+        # Сжатая logrotate часть пропускается.
+        with gzip.open(self.log + '.2.gz', 'wt') as file:
+            file.write(self.entry(feed, 900, 'group_posts', [3]) + '\n')
+        out = StringIO()
+        call_command('slow_queries', '--log', self.log, stdout=out)
+        output = out.getvalue()
+        self.assertIn('1. 2 раз, всего 570.0 мс', output)
+        self.assertIn('view: group_posts (2)', output)
+        self.assertIn('параметры самого медленного: [2]', output)
+        self.assertIn('2. 1 раз, всего 500.0 мс', output)
+        self.assertIn('план: SCAN posts_post', output)
+        self.assertIn('Видов запросов: 2, записей: 3', output)
+
+
+class ProfilesCommandTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        for number, view in enumerate(('index', 'index', 'profile')):
+            base = os.path.join(self.directory, f'{number}-{view}')
+            profile = cProfile.Profile()
+            profile.runcall(sorted, range(10))
+            profile.dump_stats(base + '.pstats')
+            with open(base + '.collapsed', 'w') as file:
+                file.write('views.index;template index.html;'
+                           '{% url %} include/post_item.html:12 3\n'
+                           'views.index;posts.models.feed 1\n')
+            with open(base + '.json', 'w') as file:
+                json.dump({'time': f'2021-01-0{number + 1}', 'view': view,
+                           'method': 'GET', 'status': 200,
+                           'duration_ms': 10.0, 'trigger': 'token'}, file)
+
+    def profiles(self, *args):
+        out = StringIO()
+        call_command('profiles', *args, '--dir', self.directory, stdout=out)
+        return out.getvalue()
+
+    def test_list(self):
+        """Список профилей фильтруется по view."""
+        self.assertIn('Профилей: 3', self.profiles('list'))
+        self.assertIn('Профилей: 2', self.profiles('list', '--view', 'index'))
+
+    def test_merge(self):
+        """Профили и стеки складываются в один файл."""
+        output = os.path.join(self.directory, 'merged')
+        self.profiles('merge', '--view', 'index', '--output', output)
+        single = pstats.Stats(
+            os.path.join(self.directory, '0-index.pstats')).total_calls
+        self.assertEqual(pstats.Stats(output + '.pstats').total_calls,
+                         2 * single)
+        with open(output + '.collapsed') as file:
+            self.assertIn('include/post_item.html:12 6\n', file.read())
+
+    def test_summary_shows_template_places(self):
+        """Сводка показывает долю выборок мест шаблонов."""
+        output = self.profiles('summary')
+        self.assertIn('sorted', output)
+        self.assertIn('75.0%  {% url %} include/post_item.html:12', output)
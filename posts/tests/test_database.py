@@ -0,0 +1,44 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase
+
+from yatube.sqlite.base import DatabaseWrapper
+
+
+class SQLitePragmasTest(SimpleTestCase):
+    def test_new_connection_gets_pragmas(self):
+        """Новое соединение с файлом базы получает WAL и прочие PRAGMA."""
+        with tempfile.TemporaryDirectory() as directory:
+            wrapper = DatabaseWrapper(dict(
+                connection.settings_dict,
+                NAME=os.path.join(directory, 'pragmas.sqlite3')), 'pragmas')
+            raw = wrapper.get_new_connection(
+                wrapper.get_connection_params())
+            try:
+                expected = {
+                    'journal_mode': 'wal',
+                    'synchronous': 1,
+                    'busy_timeout': settings.SQLITE_PRAGMAS['busy_timeout'],
+                    'cache_size': settings.SQLITE_PRAGMAS['cache_size'],
+                }
+                for name, value in expected.items():
+                    with self.subTest(pragma=name):
+                        self.assertEqual(
+                            raw.execute(f'PRAGMA {name}').fetchone()[0],
+                            value)
+            finally:
+                raw.close()
+        self.assertEqual(wrapper.transaction_mode, 'IMMEDIATE')
+
+    def test_benchmark_compares_profiles(self):
+        """Замер записи печатает строку для каждого профиля."""
+        out = StringIO()
+        call_command('benchmark_sqlite_writes', threads=2, writes=5,
+                     stdout=out)
+        self.assertIn('default:', out.getvalue())
+        self.assertIn('tuned:', out.getvalue())
@@ -0,0 +1,88 @@
+import csv
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post, User
+
+
+class ExportTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='export-author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='export-group', description='Описание')
+        cls.old = Post.objects.create(
+            text='Старый пост', author=cls.user, group=cls.group)
+        cls.new = Post.objects.create(text='Новый пост', author=cls.user)
+        Comment.objects.create(post=cls.old, author=cls.user, text='Да')
+        cls.author_client = Client()
+        cls.author_client.force_login(cls.user)
+
+    def read(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_profile_export_jsonl(self):
+        """Выгрузка автора - JSONL от новых постов к старым"""
+        response = self.author_client.get(
+            reverse('profile_export', args=[self.user.username]))
+        self.assertIn('attachment', response['Content-Disposition'])
+        rows = [json.loads(line)
+                for line in self.read(response).splitlines()]
+        self.assertEqual([row['id'] for row in rows],
+                         [self.new.pk, self.old.pk])
+        self.assertEqual(rows[1]['comment_count'], 1)
+        self.assertEqual(rows[1]['group'], self.group.slug)
+        self.assertIsNone(rows[1]['image'])
+
+    def test_group_export_csv(self):
+        """Выгрузка группы в CSV с заголовком"""
+        response = self.author_client.get(
+            reverse('group_export', args=[self.group.slug]),
+            {'format': 'csv'})
+        rows = list(csv.DictReader(StringIO(self.read(response))))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['text'], self.old.text)
+        self.assertEqual(rows[0]['author'], self.user.username)
+
+    def test_export_filename_not_ascii(self):
+        """Имя файла не ASCII передаётся по RFC 5987 с запасным именем"""
+        user = User.objects.create_user(username='автор')
+        client = Client()
+        client.force_login(user)
+        response = client.get(reverse('profile_export', args=[user.username]))
+        self.assertEqual(
+            response['Content-Disposition'],
+            'attachment; filename="posts.jsonl"; '
+            "filename*=UTF-8''%D0%B0%D0%B2%D1%82%D0%BE%D1%80-posts.jsonl")
+        self.read(response)
+        response = self.author_client.get(
+            reverse('group_export', args=[self.group.slug]))
+        self.assertEqual(
+            response['Content-Disposition'],
+            'attachment; filename="export-group-posts.jsonl"; '
+            "filename*=UTF-8''export-group-posts.jsonl")
+        self.read(response)
+
+    def test_export_requires_login_and_known_format(self):
+        url = reverse('profile_export', args=[self.user.username])
+        self.assertEqual(Client().get(url).status_code, 302)
+        self.assertEqual(
+            self.author_client.get(url, {'format': 'xml'}).status_code, 404)
+
+    def test_export_command(self):
+        """Команда пишет выгрузку группы в файл"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'group.jsonl')
+            call_command('export_posts', '--group', self.group.slug,
+                         output=path)
+            with open(path, encoding='utf-8') as file:
+                rows = [json.loads(line) for line in file]
+        self.assertEqual([row['id'] for row in rows], [self.old.pk])
@@ -1,10 +1,20 @@
+import os
+import shutil
+import stat
+import tempfile
 from http import HTTPStatus
+from io import BytesIO
 
-from django.test import Client, TestCase
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
 from posts.models import Post, Group, User
 
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
 
 class PostCreateFormTests(TestCase):
     @classmethod
@@ -116,3 +126,105 @@ class PostCreateFormTests(TestCase):
                 group=PostCreateFormTests.group.id
             ).exists()
         )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POST_IMAGE_MAX_SIDE=64)
+class PostImageUploadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='photo-user')
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.user)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def make_jpeg(self, size):
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera'
+        buffer = BytesIO()
+        Image.new('RGB', size, 'red').save(buffer, 'JPEG', exif=exif)
+        return SimpleUploadedFile(
+            name='photo.jpg', content=buffer.getvalue(),
+            content_type='image/jpeg')
+
+    def test_large_photo_is_downscaled_without_exif(self):
+        """Большое фото уменьшается и теряет EXIF"""
+        self.authorized_client.post(
+            reverse('new_post'),
+            data={'text': 'Фото', 'image': self.make_jpeg((640, 480))})
+        post = Post.objects.get(text='Фото')
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (64, 48))
+            self.assertFalse(image.getexif())
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=100)
+    def test_too_many_pixels_rejected(self):
+        """Картинка с огромным разрешением отклоняется по заголовку"""
+        response = self.authorized_client.post(
+            reverse('new_post'),
+            data={'text': 'Бомба', 'image': self.make_jpeg((20, 20))})
+        self.assertFormError(
+            response, 'form', 'image',
+            'Слишком большое разрешение изображения.')
+        self.assertFalse(Post.objects.filter(text='Бомба').exists())
+
+    def test_not_an_image_rejected(self):
+        """Файл, не являющийся картинкой, отклоняется"""
+        response = self.authorized_client.post(
+            reverse('new_post'),
+            data={'text': 'Текст', 'image': SimpleUploadedFile(
+                name='fake.jpg', content=b'not an image',
+                content_type='image/jpeg')})
+        self.assertFormError(
+            response, 'form', 'image', 'Загрузите правильное изображение.')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedStorageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='meme-user')
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.user)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def upload(self, text, name, color):
+        buffer = BytesIO()
+        Image.new('RGB', (8, 8), color).save(buffer, 'PNG')
+        self.authorized_client.post(reverse('new_post'), data={
+            'text': text,
+            'image': SimpleUploadedFile(
+                name=name, content=buffer.getvalue(),
+                content_type='image/png')})
+        return Post.objects.get(text=text).image
+
+    def test_same_image_stored_once(self):
+        """Одинаковые картинки разных постов хранятся в одном файле"""
+        first = self.upload('Первый мем', 'meme.png', 'blue')
+        second = self.upload('Второй мем', 'copy.png', 'blue')
+        self.assertEqual(first.name, second.name)
+        self.assertRegex(first.name, r'^posts/[0-9a-f]{2}/[0-9a-f]{64}\.png$')
+
+    def test_different_images_stored_separately(self):
+        """Разные картинки получают разные имена"""
+        first = self.upload('Синий', 'image.png', 'blue')
+        second = self.upload('Зелёный', 'image.png', 'green')
+        self.assertNotEqual(first.name, second.name)
+
+    @override_settings(FILE_UPLOAD_PERMISSIONS=None)
+    def test_file_readable_without_configured_mode(self):
+        """Без FILE_UPLOAD_PERMISSIONS файл получает права с учётом umask"""
+        image = self.upload('Права', 'mode.png', 'red')
+        umask = os.umask(0)
+        os.umask(umask)
+        self.assertEqual(stat.S_IMODE(os.stat(image.path).st_mode),
+                         0o666 & ~umask)
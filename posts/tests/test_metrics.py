@@ -0,0 +1,157 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post, User
+from yatube.metrics import registry
+
+
+class MetricsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='metrics-author')
+        Post.objects.create(text='Запись', author=cls.user)
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings = override_settings(METRICS_DIR=directory,
+                                     METRICS_TOKEN='metrics-token')
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.directory = directory
+        registry.reset()
+        cache.clear()
+
+    def metrics(self):
+        response = self.client.get(
+            reverse('metrics'), HTTP_AUTHORIZATION='Bearer metrics-token')
+        self.assertEqual(response.status_code, 200)
+        values = {}
+        for line in response.content.decode().splitlines():
+            if not line.startswith('#'):
+                name, value = line.rsplit(' ', 1)
+                values[name] = float(value)
+        return values
+
+    def test_views_are_measured(self):
+        """Время, запросы, шаблоны и кеш считаются по имени url."""
+        self.client.get(reverse('index'))
+        self.client.get(reverse('index'))
+        self.client.get(reverse('about:author'))
+        values = self.metrics()
+        self.assertEqual(
+            values['yatube_request_seconds_count{view="index"}'], 2)
+        self.assertEqual(
+            values['yatube_request_seconds_count{view="about:author"}'], 1)
+        self.assertGreater(values['yatube_db_queries_sum{view="index"}'], 0)
+        self.assertGreater(
+            values['yatube_template_seconds_sum{view="index"}'], 0)
+        self.assertGreater(
+            values['yatube_response_bytes_sum{view="index"}'], 0)
+        # Второй раз страница для анонима берётся из кеша.
+        self.assertGreater(values['yatube_cache_hits_total{view="index"}'], 0)
+        self.assertGreater(
+            values['yatube_cache_misses_total{view="index"}'], 0)
+        self.assertNotIn('yatube_request_seconds_count{view="metrics"}',
+                         values)
+
+    def test_streaming_response_is_measured(self):
+        """Выгрузка учитывается целиком, вместе с запросами при отдаче."""
+        self.client.force_login(self.user)
+        response = self.client.get(
+            reverse('profile_export', args=[self.user.username]))
+        size = len(b''.join(response.streaming_content))
+        values = self.metrics()
+        self.assertEqual(
+            values['yatube_response_bytes_sum{view="profile_export"}'], size)
+        self.assertGreaterEqual(
+            values['yatube_db_queries_sum{view="profile_export"}'], 3)
+
+    def test_processes_are_merged(self):
+        """Значения из файлов других процессов складываются."""
+        self.client.get(reverse('index'))
+        registry.flush(force=True)
+        with open(registry.path()) as file:
+            data = json.load(file)
+        other = os.path.join(self.directory, f'{os.getppid()}-other.json')
+        with open(other, 'w') as file:
+            json.dump(data, file)
+        values = self.metrics()
+        self.assertEqual(
+            values['yatube_request_seconds_count{view="index"}'], 2)
+        self.assertEqual(
+            values['yatube_request_seconds_bucket{view="index",le="+Inf"}'],
+            2)
+
+    def test_finished_processes_are_archived(self):
+        """Файлы завершённых процессов сливаются, и сумма не убывает."""
+        self.client.get(reverse('index'))
+        registry.flush(force=True)
+        with open(registry.path()) as file:
+            data = json.load(file)
+        for _ in range(2):
+            process = subprocess.Popen([sys.executable, '-c', ''])
+            process.wait()
+            path = os.path.join(self.directory, f'{process.pid}-old.json')
+            with open(path, 'w') as file:
+                json.dump(data, file)
+            values = self.metrics()
+            self.assertFalse(os.path.exists(path))
+        self.assertEqual(
+            values['yatube_request_seconds_count{view="index"}'], 3)
+        self.assertCountEqual(
+            [name for name in os.listdir(self.directory)
+             if name.endswith('.json')],
+            ['archive.json', os.path.basename(registry.path())])
+
+    def test_concurrent_flushes(self):
+        """Параллельные сохранения не мешают друг другу."""
+        self.client.get(reverse('index'))
+        errors = []
+
+        def flush():
+            try:
+                for _ in range(50):
+                    registry.flush(force=True)
+            except OSError as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=flush) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(
+            [name for name in os.listdir(self.directory)
+             if name.endswith('.tmp')], [])
+
+    def test_metrics_hidden_without_token(self):
+        """Страница метрик недоступна без токена, даже с localhost."""
+        self.client.force_login(self.user)
+        for authorization in ('', 'Bearer wrong-token'):
+            with self.subTest(authorization=authorization):
+                response = self.client.get(
+                    reverse('metrics'), REMOTE_ADDR='127.0.0.1',
+                    HTTP_AUTHORIZATION=authorization)
+                self.assertEqual(response.status_code, 404)
+
+    def test_metrics_closed_without_token_setting(self):
+        """Без METRICS_TOKEN страницу видят только сотрудники."""
+        with override_settings(METRICS_TOKEN=None):
+            response = self.client.get(reverse('metrics'),
+                                       HTTP_AUTHORIZATION='Bearer None')
+            self.assertEqual(response.status_code, 404)
+            self.client.force_login(User.objects.create_user(
+                username='metrics-staff', is_staff=True))
+            response = self.client.get(reverse('metrics'))
+            self.assertEqual(response.status_code, 200)
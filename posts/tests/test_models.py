@@ -1,6 +1,6 @@
 from django.test import TestCase
 
-from posts.models import Post, Group, User
+from posts.models import Comment, Post, Group, User, author_posts_count
 
 
 class PostModelTest(TestCase):
@@ -57,3 +57,56 @@ class PostModelTest(TestCase):
         group = PostModelTest.group
         title = str(group)
         self.assertEqual(title, group.title)
+
+
+class CountersTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='counter-author')
+        self.group = Group.objects.create(
+            title='Группа', slug='counters', description='Описание')
+        self.other_group = Group.objects.create(
+            title='Другая', slug='counters-other', description='Описание')
+        self.post = Post.objects.create(
+            text='Пост', author=self.user, group=self.group)
+
+    def counters(self):
+        self.group.refresh_from_db()
+        self.other_group.refresh_from_db()
+        self.post.refresh_from_db()
+        self.user.refresh_from_db()
+        return (self.group.posts_count, self.other_group.posts_count,
+                self.post.comment_count, author_posts_count(self.user))
+
+    def test_post_create_and_delete(self):
+        """Счётчики автора и группы меняются при создании и удалении."""
+        self.assertEqual(self.counters(), (1, 0, 0, 1))
+        Post.objects.create(text='Ещё', author=self.user)
+        self.assertEqual(self.counters(), (1, 0, 0, 2))
+        self.post.delete()
+        self.user.refresh_from_db()
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertEqual(author_posts_count(self.user), 1)
+
+    def test_post_moved_to_other_group(self):
+        """Перенос поста в другую группу переносит и счётчик."""
+        self.post.group = self.other_group
+        self.post.save()
+        self.assertEqual(self.counters(), (0, 1, 0, 1))
+
+    def test_comments_counter(self):
+        """comment_count меняется при добавлении и удалении комментария."""
+        comment = Comment.objects.create(
+            post=self.post, author=self.user, text='Комментарий')
+        self.assertEqual(self.counters(), (1, 0, 1, 1))
+        comment.delete()
+        self.assertEqual(self.counters(), (1, 0, 0, 1))
+
+    def test_stale_instance_keeps_counter(self):
+        """Сохранение устаревшего объекта не затирает счётчик."""
+        stale = Post.objects.get(pk=self.post.pk)
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Комментарий')
+        stale.text = 'Новый текст'
+        stale.save()
+        self.assertEqual(self.counters(), (1, 0, 1, 1))
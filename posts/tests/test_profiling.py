@@ -0,0 +1,57 @@
+import glob
+import json
+import os
+import pstats
+import shutil
+import tempfile
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from yatube.profiling import make_token
+
+
+class ProfilerMiddlewareTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        settings = override_settings(PROFILE_DIR=self.directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def saved(self):
+        return sorted(glob.glob(os.path.join(self.directory, '*.json')))
+
+    def test_signed_header_profiles_request(self):
+        """Запрос с подписанным заголовком сохраняет профиль и стеки."""
+        self.client.get(reverse('index'), HTTP_X_PROFILE=make_token())
+        [path] = self.saved()
+        with open(path) as file:
+            meta = json.load(file)
+        self.assertEqual(meta['view'], 'index')
+        self.assertEqual(meta['trigger'], 'token')
+        base = path[:-len('.json')]
+        self.assertTrue(pstats.Stats(base + '.pstats').total_calls)
+        self.assertTrue(os.path.exists(base + '.collapsed'))
+
+    def test_query_flag_profiles_request(self):
+        """Токен можно передать параметром profile."""
+        self.client.get(reverse('index'), {'profile': make_token()})
+        self.assertEqual(len(self.saved()), 1)
+
+    def test_forged_token_ignored(self):
+        """Без верной подписи запрос не профилируется."""
+        self.client.get(reverse('index'), HTTP_X_PROFILE='profile:x:y')
+        self.client.get(reverse('index'), {'profile': '1'})
+        self.assertEqual(self.saved(), [])
+
+    @override_settings(PROFILE_SAMPLE_RATE=1)
+    def test_sampling(self):
+        """При PROFILE_SAMPLE_RATE=1 профилируется каждый запрос."""
+        self.client.get(reverse('index'))
+        self.client.get(reverse('about:author'))
+        views = []
+        for path in self.saved():
+            with open(path) as file:
+                views.append(json.load(file)['view'])
+        self.assertCountEqual(views, ['index', 'about:author'])
@@ -0,0 +1,136 @@
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.template.base import Origin
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from posts import urls
+from posts.models import Comment, Group, Post, User
+from yatube.queries import NPlusOneError, NPlusOneMiddleware, query_budget
+from yatube.settings import COMMENTS_PER_PAGE, POSTS_PER_PAGE
+
+# Наибольшее число запросов к базе для каждого view из posts.urls.
+# Страницы заполнены так, что запрос на каждый пост или комментарий
+# вышел бы за бюджет.
+QUERY_BUDGETS = {
+    'index': 3,
+    'new_post': 3,
+    'search': 5,
+    'group_posts': 4,
+    'group_export': 4,
+    'profile': 4,
+    'profile_export': 4,
+    'post': 5,
+    'post_comments': 4,
+    'post_edit': 5,
+    'add_comment': 9,
+}
+
+
+class QueryBudgetTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='budget-author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='budget-group', description='Описание')
+        cls.posts = [
+            Post.objects.create(text=f'Запись {index}', author=cls.author,
+                                group=cls.group)
+            for index in range(POSTS_PER_PAGE + 2)
+        ]
+        cls.post = cls.posts[-1]
+        commenters = [
+            User.objects.create_user(username=f'budget-commenter-{index}')
+            for index in range(3)
+        ]
+        for post in cls.posts:
+            Comment.objects.create(post=post, author=commenters[0],
+                                   text='Комментарий')
+        for index in range(COMMENTS_PER_PAGE + 2):
+            Comment.objects.create(
+                post=cls.post, author=commenters[index % len(commenters)],
+                text=f'Комментарий {index}')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.author)
+
+    def requests(self):
+        """view -> (метод, url, данные)"""
+        author, post_id = self.author.username, self.post.pk
+        return {
+            'index': ('get', reverse('index'), None),
+            'new_post': ('get', reverse('new_post'), None),
+            'search': ('get', reverse('search'), {'q': 'запись'}),
+            'group_posts': (
+                'get', reverse('group_posts', args=[self.group.slug]), None),
+            'group_export': (
+                'get', reverse('group_export', args=[self.group.slug]),
+                None),
+            'profile': ('get', reverse('profile', args=[author]), None),
+            'profile_export': (
+                'get', reverse('profile_export', args=[author]), None),
+            'post': ('get', reverse('post', args=[author, post_id]), None),
+            'post_comments': (
+                'get', reverse('post_comments', args=[author, post_id]),
+                None),
+            'post_edit': (
+                'get', reverse('post_edit', args=[author, post_id]), None),
+            'add_comment': (
+                'post', reverse('add_comment', args=[author, post_id]),
+                {'text': 'Ещё комментарий'}),
+        }
+
+    def test_every_view_has_budget(self):
+        """Бюджет объявлен для каждого view из posts.urls."""
+        self.assertEqual(
+            {pattern.name for pattern in urls.urlpatterns},
+            set(QUERY_BUDGETS))
+
+    def test_views_fit_budget(self):
+        """Ни одно view не делает больше запросов, чем в бюджете."""
+        for name, (method, url, data) in self.requests().items():
+            with self.subTest(view=name), query_budget(QUERY_BUDGETS[name]):
+                response = getattr(self.client, method)(url, data)
+                self.assertLess(response.status_code, 400)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+
+    def test_budget_lists_queries(self):
+        """Превышение бюджета перечисляет выполненные запросы."""
+        with self.assertRaisesMessage(AssertionError, 'при бюджете 1'):
+            with query_budget(1):
+                list(User.objects.all())
+                list(Group.objects.all())
+
+
+@override_settings(DETECT_N_PLUS_ONE=True)
+class NPlusOneMiddlewareTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(username='loop-author')
+        for index in range(3):
+            Post.objects.create(text=f'Запись {index}', author=author)
+
+    def render(self, source):
+        template = Template(source, origin=Origin(
+            'loop.html', template_name='loop.html'))
+        middleware = NPlusOneMiddleware(lambda request: HttpResponse(
+            template.render(Context({'posts': Post.objects.all()}))))
+        return middleware(RequestFactory().get('/loop/'))
+
+    def test_query_in_loop_names_template_line(self):
+        """Запрос в цикле шаблона роняет тест с указанием строки."""
+        with self.assertRaisesMessage(
+                NPlusOneError,
+                'loop.html:2 {{ post.comments.count }}'):
+            self.render('{% for post in posts %}\n'
+                        '{{ post.comments.count }}\n'
+                        '{% endfor %}')
+
+    def test_single_query_passes(self):
+        """Счётчик из поля поста не даёт запросов в цикле."""
+        self.render('{% for post in posts %}\n'
+                    '{{ post.comment_count }}\n'
+                    '{% endfor %}')
@@ -0,0 +1,86 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post, User
+from posts.paginator import NEXT, CursorPaginator
+from yatube.settings import POSTS_PER_PAGE
+
+# Признаки плохого плана в выводе EXPLAIN QUERY PLAN SQLite: полный
+# просмотр таблицы (обход по индексу - не полный) и сортировка в памяти.
+FULL_SCAN = 'SCAN '
+INDEXED = ('USING INDEX', 'USING COVERING INDEX', 'VIRTUAL TABLE')
+TEMP_SORT = 'USE TEMP B-TREE'
+
+
+def bad_step(step):
+    return (step.startswith(FULL_SCAN)
+            and not any(marker in step for marker in INDEXED)
+            or TEMP_SORT in step)
+
+
+class QueryPlanTest(TestCase):
+    """Запросы страниц читают таблицы только по индексам."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='plan-author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='plan-group', description='Описание')
+        cls.posts = [
+            Post.objects.create(
+                text=f'Запись номер {index}', author=cls.user,
+                group=cls.group)
+            for index in range(POSTS_PER_PAGE + 2)
+        ]
+        for index in range(3):
+            Comment.objects.create(
+                post=cls.posts[-1], author=cls.user,
+                text=f'Комментарий {index}')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assert_indexed(self, url, data=None):
+        # Без кеша страница действительно читает базу.
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, data)
+        self.assertEqual(response.status_code, 200)
+        selects = [query['sql'] for query in queries.captured_queries
+                   if query['sql'].startswith('SELECT')]
+        self.assertTrue(selects, url)
+        for sql in selects:
+            for step in self.explain(sql):
+                with self.subTest(url=url, sql=sql, step=step):
+                    self.assertFalse(bad_step(step), step)
+
+    def test_pages_use_indexes(self):
+        """Страницы не сканируют таблицы целиком и не сортируют в памяти"""
+        cache.clear()
+        first = self.client.get(reverse('index')).context['page']
+        comment_cursor = CursorPaginator(
+            Comment.objects.all(), 1, ('-created', '-id')).encode_cursor(
+                NEXT, Comment.objects.first())
+        pages = {
+            reverse('index'): None,
+            reverse('index') + '?cursor=' + first.next_cursor: None,
+            reverse('group_posts', args=[self.group.slug]): None,
+            reverse('profile', args=[self.user.username]): None,
+            reverse('post', args=[self.user.username,
+                                  self.posts[-1].pk]): None,
+            reverse('search'): {'q': 'запись'},
+            reverse('post_comments', args=[self.user.username,
+                                           self.posts[-1].pk]):
+                {'cursor': comment_cursor},
+        }
+        for url, data in pages.items():
+            self.assert_indexed(url, data)
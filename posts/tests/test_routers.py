@@ -0,0 +1,64 @@
+from django.contrib.sessions.models import Session
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.urls import resolve, reverse
+
+from posts.models import Post
+from yatube.routers import (PRIMARY, ReplicaRouter, ReplicaRoutingMiddleware,
+                            replica_reads)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTest(SimpleTestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+        self.read_from = None
+
+    def view(self, request):
+        self.read_from = self.router.db_for_read(Post)
+        return HttpResponse()
+
+    def call(self, request):
+        request.resolver_match = resolve(request.path)
+
+        def get_response(request):
+            middleware.process_view(request, self.view, (), {})
+            return self.view(request)
+
+        middleware = ReplicaRoutingMiddleware(get_response)
+        return middleware(request)
+
+    def test_feed_reads_from_replica(self):
+        """Чтение в ленте идёт с реплики, запись - на основную базу."""
+        self.call(self.factory.get(reverse('index')))
+        self.assertEqual(self.read_from, 'replica')
+        self.assertEqual(self.router.db_for_write(Post), PRIMARY)
+
+    def test_other_views_read_from_primary(self):
+        """View не из REPLICA_READ_VIEWS читают с основной базы."""
+        self.call(self.factory.get(reverse('new_post')))
+        self.assertEqual(self.read_from, PRIMARY)
+
+    def test_sessions_and_outside_requests_use_primary(self):
+        """Сессии и код вне запроса не читают с реплики."""
+        self.assertEqual(self.router.db_for_read(Post), PRIMARY)
+        token = replica_reads.set(True)
+        try:
+            self.assertEqual(self.router.db_for_read(Session), PRIMARY)
+        finally:
+            replica_reads.reset(token)
+
+    def test_write_pins_reads_to_primary(self):
+        """После записи клиент читает с основной базы, пока жива cookie."""
+        response = self.call(self.factory.post(reverse('new_post')))
+        cookie = response.cookies['primary_pin']
+        self.assertTrue(cookie['max-age'])
+        request = self.factory.get(reverse('index'))
+        request.COOKIES['primary_pin'] = cookie.value
+        self.call(request)
+        self.assertEqual(self.read_from, PRIMARY)
+
+    def test_replicas_are_not_migrated(self):
+        self.assertFalse(self.router.allow_migrate('replica', 'posts'))
+        self.assertTrue(self.router.allow_migrate(PRIMARY, 'posts'))
@@ -0,0 +1,122 @@
+from unittest import mock
+
+from django.contrib.admin.sites import site
+from django.test import Client, RequestFactory, TestCase
+from django.urls import reverse
+
+from posts import search
+from posts.models import Comment, Post, User
+from posts.search import FTS5Backend, InvertedIndexBackend, get_backend
+
+
+class SearchBackendMixin:
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='search-user')
+        cls.cats = Post.objects.create(
+            text='Кошки любят спать на солнце', author=cls.user)
+        cls.dogs = Post.objects.create(
+            text='Собаки любят гулять. Собаки любят мячи', author=cls.user)
+        cls.comment = Comment.objects.create(
+            text='Мои кошки тоже', post=cls.dogs, author=cls.user)
+
+    def test_finds_posts_by_word(self):
+        """Поиск находит посты по слову без учёта регистра"""
+        self.assertEqual(self.backend.search(Post, 'КОШКИ'), [self.cats.pk])
+
+    def test_all_words_required_and_ranked(self):
+        """Все слова запроса обязательны, релевантные посты выше"""
+        self.assertEqual(self.backend.search(Post, 'любят спать'),
+                         [self.cats.pk])
+        self.assertEqual(self.backend.search(Post, 'любят'),
+                         [self.dogs.pk, self.cats.pk])
+
+    def test_finds_comments(self):
+        """Поиск по комментариям"""
+        self.assertEqual(self.backend.search(Comment, 'кошки'),
+                         [self.comment.pk])
+
+    def test_index_follows_changes(self):
+        """Индекс обновляется при изменении и удалении постов"""
+        self.backend.search(Post, 'кошки')
+        self.cats.text = 'Хомяки'
+        self.cats.save()
+        self.assertEqual(self.backend.search(Post, 'кошки'), [])
+        self.assertEqual(self.backend.search(Post, 'хомяки'), [self.cats.pk])
+        self.cats.delete()
+        self.assertEqual(self.backend.search(Post, 'хомяки'), [])
+
+
+class FTS5SearchTest(SearchBackendMixin, TestCase):
+    backend = FTS5Backend()
+
+    def test_bulk_inserts_are_indexed(self):
+        """Триггеры индексируют даже записи из bulk_create"""
+        Post.objects.bulk_create([
+            Post(text='Попугаи говорят', author=FTS5SearchTest.user)])
+        self.assertEqual(len(self.backend.search(Post, 'попугаи')), 1)
+
+
+class InvertedIndexSearchTest(SearchBackendMixin, TestCase):
+    def setUp(self):
+        self.backend = InvertedIndexBackend()
+        # Сигналы обновляют индекс текущего бэкенда.
+        self.previous_backend = search._backend
+        search._backend = self.backend
+
+    def tearDown(self):
+        search._backend = self.previous_backend
+
+
+class SearchViewTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='search-admin', is_staff=True, is_superuser=True)
+        cls.post = Post.objects.create(
+            text='Уникальное слово абракадабра', author=cls.user)
+
+    def test_search_page_shows_results(self):
+        """Страница /search/ показывает найденные посты"""
+        response = Client().get(reverse('search'), {'q': 'абракадабра'})
+        self.assertEqual(response.context['posts'], [SearchViewTest.post])
+        self.assertContains(response, 'Уникальное слово')
+
+    def test_search_page_without_results(self):
+        """Пустой результат поиска"""
+        response = Client().get(reverse('search'), {'q': 'несуществующее'})
+        self.assertContains(response, 'Ничего не найдено.')
+
+    def test_search_page_number_out_of_range(self):
+        """Огромный номер страницы поиска даёт пустую страницу, а не 500"""
+        response = Client().get(reverse('search'),
+                                {'q': 'абракадабра', 'page': 10 ** 20})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['posts'], [])
+        self.assertContains(response, 'Ничего не найдено.')
+
+    def test_search_page_skips_stale_ids(self):
+        """id удалённой записи из индекса не ломает страницу"""
+        stale = [SearchViewTest.post.pk + 1000]
+        with mock.patch('posts.views.search',
+                        side_effect=lambda model, *args: (
+                            [SearchViewTest.post.pk] + stale
+                            if model is Post else stale)):
+            response = Client().get(reverse('search'), {'q': 'абракадабра'})
+        self.assertEqual(response.context['posts'], [SearchViewTest.post])
+        self.assertEqual(response.context['comments'], [])
+
+    def test_admin_uses_full_text_index(self):
+        """Поиск в админке идёт через полнотекстовый индекс"""
+        request = RequestFactory().get('/admin/posts/post/')
+        request.user = SearchViewTest.user
+        queryset, use_distinct = site._registry[Post].get_search_results(
+            request, Post.objects.all(), 'абракадабра')
+        self.assertEqual(list(queryset), [SearchViewTest.post])
+        self.assertFalse(use_distinct)
+
+    def test_sqlite_uses_fts5(self):
+        """На SQLite используется FTS5"""
+        self.assertIsInstance(get_backend(), FTS5Backend)
@@ -0,0 +1,70 @@
+import json
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Group, Post, User
+from yatube.slow_queries import current_view
+
+
+class SlowQueryLogTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='slow-author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='slow-group', description='Описание')
+        Post.objects.create(text='Запись', author=cls.user, group=cls.group)
+
+    # Порог только внутри тестов: запросы setUpTestData не должны
+    # попадать в настоящий лог.
+    @override_settings(SLOW_QUERY_SECONDS=0)
+    def test_query_logged_with_view_and_plan(self):
+        """Медленный запрос пишется с параметрами, view и планом."""
+        with self.assertLogs('yatube.slow_queries', 'INFO') as logs:
+            self.client.get(reverse('profile', args=[self.user.username]))
+        entries = [json.loads(record.getMessage())
+                   for record in logs.records]
+        entry = next(entry for entry in entries
+                     if self.user.username in entry['params'])
+        self.assertEqual(entry['view'], 'profile')
+        self.assertNotIn(self.user.username, entry['shape'])
+        self.assertTrue(entry['plan'])
+
+    @override_settings(SLOW_QUERY_SECONDS=0)
+    def test_explain_is_not_counted(self):
+        """EXPLAIN идёт мимо обёрток и не добавляет запросов."""
+        with self.assertLogs('yatube.slow_queries', 'INFO'):
+            with self.assertNumQueries(1):
+                Post.objects.count()
+
+    @override_settings(SLOW_QUERY_SECONDS=None)
+    def test_disabled(self):
+        """Без порога лог не пишется."""
+        with self.assertRaises(AssertionError):
+            with self.assertLogs('yatube.slow_queries', 'INFO'):
+                Post.objects.count()
+
+    @override_settings(SLOW_QUERY_SECONDS=0)
+    def test_view_reset_after_response(self):
+        """После ответа запросы вне HTTP не приписываются view."""
+        with self.assertLogs('yatube.slow_queries', 'INFO') as logs:
+            self.client.get(reverse('index'))
+            Post.objects.count()
+        self.assertEqual(json.loads(logs.records[-1].getMessage())['view'],
+                         None)
+
+    @override_settings(SLOW_QUERY_SECONDS=0)
+    def test_view_kept_while_streaming(self):
+        """Потоковый ответ читает базу под своим view до конца."""
+        with self.assertLogs('yatube.slow_queries', 'INFO') as logs:
+            self.client.force_login(self.user)
+            response = self.client.get(
+                reverse('group_export', args=[self.group.slug]))
+            self.assertIn('Запись', b''.join(
+                response.streaming_content).decode())
+        entries = [json.loads(record.getMessage())
+                   for record in logs.records]
+        views = {entry['view'] for entry in entries
+                 if 'posts_post' in entry['sql']}
+        self.assertEqual(views, {'group_export'})
+        self.assertIsNone(current_view.get())
@@ -0,0 +1,75 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix
+
+from posts.models import Post, User
+from posts.thumbnails import prefetch_thumbnails
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailPrefetchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Картинки адресуются по содержимому: записи о них могли остаться
+        # в кеше от других тестов.
+        cache.clear()
+        default.kvstore.clear_local()
+        cls.user = User.objects.create_user(username='prefetch-author')
+        cls.posts = []
+        for color in ('red', 'green', 'blue'):
+            buffer = BytesIO()
+            Image.new('RGB', (4, 4), color).save(buffer, 'GIF')
+            cls.posts.append(Post.objects.create(
+                text=f'Пост с картинкой {color}',
+                author=cls.user,
+                image=SimpleUploadedFile(
+                    name=f'{color}.gif', content=buffer.getvalue(),
+                    content_type='image/gif')))
+        for post in cls.posts:
+            for geometry, options in settings.THUMBNAIL_PRESETS:
+                get_thumbnail(post.image, geometry, **options)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        default.kvstore.clear_local()
+
+    def test_prefetch_uses_one_query_for_page(self):
+        """Метаданные миниатюр страницы загружаются одним запросом"""
+        with self.assertNumQueries(1):
+            prefetch_thumbnails(ThumbnailPrefetchTest.posts)
+
+    def test_prefetched_thumbnails_need_no_queries(self):
+        """После предзагрузки тег thumbnail не обращается к БД"""
+        prefetch_thumbnails(ThumbnailPrefetchTest.posts)
+        with self.assertNumQueries(0):
+            for post in ThumbnailPrefetchTest.posts:
+                for geometry, options in settings.THUMBNAIL_PRESETS:
+                    get_thumbnail(post.image, geometry, **options)
+
+    def test_thumbnail_lists_not_kept_in_process(self):
+        """Списки миниатюр читаются из общего кеша, а не из процесса"""
+        kvstore = default.kvstore
+        key = add_prefix(ImageFile(ThumbnailPrefetchTest.posts[0].image).key,
+                         identity='thumbnails')
+        value = kvstore._get_raw(key)
+        self.assertIsNotNone(value)
+        self.assertNotIn(key, kvstore._local)
+        cache.set(key, '[]')
+        self.assertEqual(kvstore._get_raw(key), '[]')
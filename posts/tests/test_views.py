@@ -1,14 +1,27 @@
 from django import forms
+import os
 import shutil
+import subprocess
+import sys
 import tempfile
+import time
+import warnings
+from unittest import mock
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.cache.backends.base import CacheKeyWarning
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
+from django.template import Context, Template
 from django.test import Client, TestCase
 from django.urls import reverse
 from django.conf import settings
 
-from posts.models import User, Group, Post
+from posts.cache import FEED_GENERATION_KEY, bump_generations
+from posts.models import User, Group, Post, Comment
+from posts.tests.utils import run_on_commit
 from yatube.settings import POSTS_PER_PAGE
 
 User = get_user_model()
@@ -200,6 +213,9 @@ class PaginatorViewsTest(TestCase):
                 group=PaginatorViewsTest.test_group,
                 author=User.objects.create(username=username_par)))
 
+    def setUp(self):
+        cache.clear()
+
     def test_first_page_containse_ten_records(self):
         """Проверка правильной работы пагинатора 1ая страница"""
         response = self.client.get(reverse('index'))
@@ -212,3 +228,450 @@ class PaginatorViewsTest(TestCase):
         self.assertEqual(
             len(response.context.get('page').object_list),
             PaginatorViewsTest.delta_posts)
+
+    def test_page_out_of_range_shows_last_page(self):
+        """Номер страницы за концом ленты открывает последнюю страницу"""
+        group_url = reverse('group_posts',
+                            args=[PaginatorViewsTest.test_group.slug])
+        for url in (reverse('index'), group_url):
+            for number in (3, 10 ** 20):
+                with self.subTest(url=url, page=number):
+                    response = self.client.get(url, {'page': number})
+                    self.assertEqual(response.status_code, 200)
+                    page = response.context.get('page')
+                    self.assertEqual(page.number, 2)
+                    self.assertEqual(len(page.object_list),
+                                     PaginatorViewsTest.delta_posts)
+
+    def test_group_feed_shows_all_posts(self):
+        """Лента группы листается до последней записи группы"""
+        url = reverse('group_posts',
+                      args=[PaginatorViewsTest.test_group.slug])
+        seen, cursor = [], None
+        while True:
+            page = self.client.get(url, {'cursor': cursor} if cursor else {}
+                                   ).context.get('page')
+            seen.extend(page.object_list)
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+        self.assertEqual(
+            [post.pk for post in seen],
+            [post.pk for post in reversed(PaginatorViewsTest.array_posts)])
+
+    def test_cursor_pages_follow_each_other(self):
+        """Курсор следующей страницы ведёт на оставшиеся записи"""
+        first = self.client.get(reverse('index')).context.get('page')
+        second = self.client.get(
+            reverse('index'), {'cursor': first.next_cursor}
+        ).context.get('page')
+        self.assertEqual(len(second.object_list),
+                         PaginatorViewsTest.delta_posts)
+        self.assertFalse(second.has_next())
+        self.assertEqual(
+            list(first) + list(second),
+            list(Post.objects.order_by('-pub_date', '-id')))
+
+    def test_cursor_previous_page_returns_first_page(self):
+        """Курсор предыдущей страницы возвращает первую страницу"""
+        first = self.client.get(reverse('index')).context.get('page')
+        second = self.client.get(
+            reverse('index'), {'cursor': first.next_cursor}
+        ).context.get('page')
+        previous = self.client.get(
+            reverse('index'), {'cursor': second.previous_cursor}
+        ).context.get('page')
+        self.assertEqual(list(previous), list(first))
+        self.assertFalse(previous.has_previous())
+
+    def test_invalid_cursor_shows_first_page(self):
+        """Испорченный курсор открывает первую страницу"""
+        response = self.client.get(reverse('index'), {'cursor': 'broken'})
+        self.assertEqual(
+            len(response.context.get('page').object_list), POSTS_PER_PAGE)
+
+
+class FeedQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='feed-author')
+        cls.group = Group.objects.create(
+            title='Группа ленты',
+            slug='feed-slug',
+            description='Лента')
+        cls.post = Post.objects.create(
+            text='Первый пост', group=cls.group, author=cls.user)
+        Comment.objects.create(
+            text='Комментарий', post=cls.post, author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        return len(queries)
+
+    def test_feed_queries_do_not_grow_with_posts(self):
+        """Число запросов ленты не зависит от числа постов на странице"""
+        urls = (
+            reverse('index'),
+            reverse('group_posts', args=[FeedQueriesTest.group.slug]),
+            reverse('profile', args=[FeedQueriesTest.user.username]),
+        )
+        before = [self.count_queries(url) for url in urls]
+        for index in range(POSTS_PER_PAGE - 1):
+            post = Post.objects.create(
+                text=f'Пост {index}',
+                group=FeedQueriesTest.group,
+                author=User.objects.create(username=f'feed-user-{index}'))
+            Comment.objects.create(
+                text='Комментарий', post=post, author=FeedQueriesTest.user)
+        after = [self.count_queries(url) for url in urls]
+        self.assertEqual(before, after)
+
+    def test_feed_shows_comment_count(self):
+        """Число комментариев берётся из счётчика поста"""
+        response = self.client.get(reverse('index'))
+        post_object = response.context['page'][0]
+        self.assertEqual(post_object.comment_count, 1)
+        self.assertContains(response, 'Комментариев: 1')
+
+
+class PostCardCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='card-author')
+        cls.group = Group.objects.create(
+            title='Группа карточки',
+            slug='card-slug',
+            description='Карточки')
+
+    def setUp(self):
+        with run_on_commit():
+            self.post = Post.objects.create(
+                text='Исходный текст',
+                group=PostCardCacheTest.group,
+                author=PostCardCacheTest.user)
+        self.client.force_login(
+            User.objects.create_user(username='card-reader'))
+        self.client.get(reverse('index'))
+
+    def test_card_is_served_from_cache(self):
+        """Карточка поста берётся из кеша, пока пост не изменился"""
+        Post.objects.filter(pk=self.post.pk).update(text='Тихая правка')
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, 'Исходный текст')
+
+    def test_card_without_prefetch_is_read_from_cache(self):
+        """Без prefetch_post_cards карточка тоже берётся из кеша"""
+        Post.objects.filter(pk=self.post.pk).update(text='Тихая правка')
+        html = Template('{% load post_cards %}{% post_card post %}').render(
+            Context({'post': Post.objects.get(pk=self.post.pk)}))
+        self.assertIn('Исходный текст', html)
+
+    def test_post_save_invalidates_card(self):
+        """Сохранение поста обновляет его карточку"""
+        self.post.text = 'Новый текст'
+        with run_on_commit():
+            self.post.save()
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, 'Новый текст')
+
+    def test_comment_invalidates_card(self):
+        """Новый комментарий обновляет счётчик на карточке"""
+        with run_on_commit():
+            Comment.objects.create(text='Комментарий', post=self.post,
+                                   author=PostCardCacheTest.user)
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, 'Комментариев: 1')
+
+    def test_group_title_invalidates_card(self):
+        """Новое название группы попадает в карточки её постов"""
+        group = PostCardCacheTest.group
+        group.title = 'Переименованная группа'
+        with run_on_commit():
+            group.save()
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, '#Переименованная группа')
+
+    def test_author_rename_invalidates_card(self):
+        """Новое имя автора попадает в карточки его постов"""
+        user = PostCardCacheTest.user
+        user.username = 'renamed-card-author'
+        with run_on_commit():
+            user.save()
+        self.addCleanup(setattr, user, 'username', 'card-author')
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, '@renamed-card-author')
+
+    def test_card_version_changes_after_commit(self):
+        """До фиксации транзакции версия карточки не меняется"""
+        with run_on_commit():
+            self.post.text = 'Незафиксированный текст'
+            self.post.save()
+            response = self.client.get(reverse('index'))
+            self.assertContains(response, 'Исходный текст')
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, 'Незафиксированный текст')
+
+
+class AnonymousPageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='page-author')
+        cls.group = Group.objects.create(
+            title='Группа страницы',
+            slug='page-slug',
+            description='Страницы')
+        cls.post = Post.objects.create(
+            text='Текст страницы',
+            group=cls.group,
+            author=cls.user)
+        cls.urls = (
+            reverse('index'),
+            reverse('group_posts', args=[cls.group.slug]),
+            reverse('profile', args=[cls.user.username]),
+            reverse('post', args=[cls.user.username, cls.post.id]),
+        )
+
+    def setUp(self):
+        for url in AnonymousPageCacheTest.urls:
+            self.client.get(url)
+
+    def test_anonymous_pages_are_cached(self):
+        """Анонимы получают закешированные страницы"""
+        Post.objects.filter(pk=AnonymousPageCacheTest.post.pk).update(
+            text='Тихая правка')
+        for url in AnonymousPageCacheTest.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertContains(response, 'Текст страницы')
+
+    def test_authorized_pages_are_not_cached(self):
+        """Для авторизованных пользователей страницы рендерятся заново"""
+        self.client.force_login(AnonymousPageCacheTest.user)
+        for url in AnonymousPageCacheTest.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertIsNotNone(response.context)
+
+    def test_post_save_invalidates_pages(self):
+        """Сохранение поста обновляет все страницы, где он виден"""
+        post = AnonymousPageCacheTest.post
+        post.text = 'Сохранённая правка'
+        with run_on_commit():
+            post.save()
+        for url in AnonymousPageCacheTest.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertContains(response, 'Сохранённая правка')
+
+    def test_comment_invalidates_post_page(self):
+        """Новый комментарий сразу виден анонимам"""
+        with run_on_commit():
+            Comment.objects.create(
+                text='Свежий комментарий',
+                post=AnonymousPageCacheTest.post,
+                author=AnonymousPageCacheTest.user)
+        response = self.client.get(AnonymousPageCacheTest.urls[-1])
+        self.assertContains(response, 'Свежий комментарий')
+
+    def test_author_edit_invalidates_profile(self):
+        """Новое имя автора сразу видно анонимам в профиле"""
+        user = AnonymousPageCacheTest.user
+        user.first_name = 'Новое'
+        user.last_name = 'Имя'
+        with run_on_commit():
+            user.save()
+        response = self.client.get(AnonymousPageCacheTest.urls[2])
+        self.assertContains(response, 'Новое Имя')
+
+    def test_login_keeps_pages_cached(self):
+        """Вход пользователя не сбрасывает кеш страниц"""
+        Post.objects.filter(pk=AnonymousPageCacheTest.post.pk).update(
+            text='Тихая правка')
+        Client().force_login(AnonymousPageCacheTest.user)
+        response = self.client.get(AnonymousPageCacheTest.urls[0])
+        self.assertContains(response, 'Текст страницы')
+
+    def test_cache_keys_are_memcached_safe(self):
+        """Имя автора с пробелом и кириллицей не попадает в ключ кеша"""
+        author = User.objects.create_user(username='Пользователь 7')
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', CacheKeyWarning)
+            response = self.client.get(
+                reverse('profile', args=[author.username]))
+        self.assertEqual(response.status_code, 200)
+
+    def test_pages_change_after_commit(self):
+        """До фиксации транзакции аноним получает старую страницу"""
+        post = AnonymousPageCacheTest.post
+        with run_on_commit():
+            post.text = 'Незафиксированная правка'
+            post.save()
+            self.assertContains(self.client.get(
+                AnonymousPageCacheTest.urls[0]), 'Текст страницы')
+        self.assertContains(self.client.get(
+            AnonymousPageCacheTest.urls[0]), 'Незафиксированная правка')
+
+    def test_generations_shared_between_processes(self):
+        """Поколение, сменённое в одном процессе, видит другой"""
+        with run_on_commit():
+            bump_generations([FEED_GENERATION_KEY])
+        other = subprocess.run(
+            [sys.executable, '-c',
+             'import django; django.setup(); '
+             'from django.core.cache import cache; '
+             f'print(cache.get({FEED_GENERATION_KEY!r}))'],
+            env=dict(os.environ, DJANGO_SETTINGS_MODULE='yatube.settings',
+                     YATUBE_CACHE_DIR=settings.CACHES['default']['LOCATION']),
+            cwd=settings.BASE_DIR, capture_output=True, text=True,
+            check=True)
+        self.assertEqual(other.stdout.strip(), cache.get(FEED_GENERATION_KEY))
+
+    def test_moved_post_leaves_old_group_page(self):
+        """Пост, перенесённый в другую группу, пропадает со старой"""
+        with run_on_commit():
+            post = Post.objects.create(
+                text='Переезжающий пост',
+                group=AnonymousPageCacheTest.group,
+                author=AnonymousPageCacheTest.user)
+        url = reverse('group_posts', args=[AnonymousPageCacheTest.group.slug])
+        self.assertContains(self.client.get(url), 'Переезжающий пост')
+        with run_on_commit():
+            post.group = Group.objects.create(
+                title='Новая группа', slug='new-page-slug', description='')
+            post.save()
+        self.assertNotContains(self.client.get(url), 'Переезжающий пост')
+
+
+class ConditionalPostViewTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='conditional-author')
+        cls.post = Post.objects.create(
+            text='Пост с условным GET', author=cls.user)
+        cls.url = reverse('post', args=[cls.user.username, cls.post.pk])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_not_modified(self):
+        """Повторный запрос с ETag получает 304 после одного запроса"""
+        response = self.client.get(self.url)
+        self.assertTrue(response.has_header('Last-Modified'))
+        self.assertIn('no-cache', response['Cache-Control'])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(queries), 1)
+
+    def test_changes_are_modified(self):
+        """Правка, комментарий и вход пользователя меняют ETag"""
+        etag = self.client.get(self.url)['ETag']
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Исправленный пост'
+        with run_on_commit():
+            post.save()
+        self.assertGreater(
+            Post.objects.get(pk=post.pk).updated, self.post.updated)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        with run_on_commit():
+            Comment.objects.create(post=post, author=self.user, text='Новый')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.client.force_login(self.user)
+        response = self.client.get(
+            self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+    def test_deleted_comment_is_modified(self):
+        """Удаление самого нового комментария не сдвигает дату назад"""
+        with run_on_commit():
+            comment = Comment.objects.create(
+                post=self.post, author=self.user, text='Удаляемый')
+        last_modified = self.client.get(self.url)['Last-Modified']
+        # HTTP-даты с точностью до секунды: удаление секундой позже.
+        with mock.patch('time.time', return_value=time.time() + 1), \
+                run_on_commit():
+            comment.delete()
+        response = self.client.get(
+            self.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'Удаляемый')
+
+
+    def test_new_login_is_modified(self):
+        """После нового входа форма получает свежий CSRF-токен"""
+        self.user.set_password('secret-password')
+        self.user.save()
+        client = Client(enforce_csrf_checks=True)
+
+        def login():
+            client.get(reverse('login'))
+            client.post(reverse('login'), {
+                'username': self.user.username,
+                'password': 'secret-password',
+                'csrfmiddlewaretoken': client.cookies['csrftoken'].value})
+
+        login()
+        response = client.get(self.url)
+        self.assertFalse(response.has_header('Last-Modified'))
+        etag = response['ETag']
+        client.logout()
+        login()
+        response = client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        response = client.post(
+            reverse('add_comment', args=[self.user.username, self.post.pk]),
+            {'text': 'Комментарий',
+             'csrfmiddlewaretoken': response.context['csrf_token']})
+        self.assertEqual(response.status_code, 302)
+
+
+class CommentPagesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='thread-author')
+        cls.post = Post.objects.create(
+            text='Обсуждаемый пост', author=cls.user)
+        cls.comments = [
+            Comment.objects.create(post=cls.post, author=cls.user,
+                                   text=f'Комментарий {index}')
+            for index in range(settings.COMMENTS_PER_PAGE + 2)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_post_page_shows_first_comments(self):
+        """Страница поста показывает только первую страницу комментариев"""
+        response = self.client.get(
+            reverse('post', args=[self.user.username, self.post.pk]))
+        page = response.context['comments']
+        self.assertEqual(len(page), settings.COMMENTS_PER_PAGE)
+        self.assertEqual(page[0], self.comments[-1])
+        self.assertContains(response, 'data-fragment=')
+
+    def test_fragment_returns_next_block(self):
+        """Фрагмент по курсору отдаёт следующий блок без обёртки страницы"""
+        page = self.client.get(
+            reverse('post', args=[self.user.username, self.post.pk])
+        ).context['comments']
+        response = self.client.get(
+            reverse('post_comments', args=[self.user.username, self.post.pk]),
+            {'cursor': page.next_cursor})
+        self.assertEqual(list(response.context['comments']),
+                         self.comments[1::-1])
+        self.assertNotContains(response, '<html')
+        self.assertNotContains(response, 'data-fragment=')
@@ -0,0 +1,20 @@
+from contextlib import contextmanager
+
+from django.db import connection
+
+
+@contextmanager
+def run_on_commit():
+    """Выполняет колбэки transaction.on_commit, добавленные в блоке.
+
+    TestCase не фиксирует транзакцию теста, поэтому сами они не
+    сработают; это аналог captureOnCommitCallbacks(execute=True)
+    из Django 3.2.
+    """
+    start = len(connection.run_on_commit)
+    yield
+    while len(connection.run_on_commit) > start:
+        callbacks = connection.run_on_commit[start:]
+        del connection.run_on_commit[start:]
+        for _, callback in callbacks:
+            callback()
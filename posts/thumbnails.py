@@ -0,0 +1,153 @@
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails')
+    return _executor
+
+
+def generate_thumbnails(image):
+    """Создаёт все миниатюры из THUMBNAIL_PRESETS для одной картинки."""
+    try:
+        for geometry, options in settings.THUMBNAIL_PRESETS:
+            get_thumbnail(image, geometry, **options)
+    except Exception:
+        logger.exception('Thumbnail generation failed for %s', image.name)
+        return False
+    finally:
+        # Потоки пула открывают собственные соединения для kvstore.
+        if threading.current_thread() is not threading.main_thread():
+            connections.close_all()
+    return True
+
+
+def schedule_thumbnails(post):
+    """Ставит картинку поста в очередь пула после коммита транзакции."""
+    if not post.image:
+        return
+    image = post.image
+    transaction.on_commit(
+        lambda: get_executor().submit(generate_thumbnails, image))
+
+
+class KVStore(cached_db_kvstore.KVStore):
+    """Хранилище sorl-thumbnail с ещё одним уровнем в памяти процесса.
+
+    Порядок поиска: словарь процесса, общий кеш, таблица в БД.
+    В словаре процесса держатся только записи image||: они не меняются
+    после создания, поэтому хранятся без срока жизни, с ограничением
+    размера. Списки thumbnails|| дополняются другими процессами и
+    всегда читаются из общего кеша.
+    """
+
+    _local = OrderedDict()
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _is_local(key):
+        return key.startswith(add_prefix(''))
+
+    def _remember(self, key, value):
+        if not self._is_local(key):
+            return
+        with self._lock:
+            self._local[key] = value
+            self._local.move_to_end(key)
+            while len(self._local) > settings.THUMBNAIL_LOCAL_CACHE_SIZE:
+                self._local.popitem(last=False)
+
+    def _get_raw(self, key):
+        with self._lock:
+            value = self._local.get(key)
+        if value is not None:
+            return value
+        value = super()._get_raw(key)
+        if value is not None:
+            self._remember(key, value)
+        return value
+
+    def _set_raw(self, key, value):
+        super()._set_raw(key, value)
+        self._remember(key, value)
+
+    def _delete_raw(self, *keys):
+        super()._delete_raw(*keys)
+        with self._lock:
+            for key in keys:
+                self._local.pop(key, None)
+
+    def clear_local(self):
+        with self._lock:
+            self._local.clear()
+
+    def prefetch_raw(self, keys):
+        """Загружает записи по ключам: один get_many к кешу и не больше
+        одного запроса к БД для промахов."""
+        with self._lock:
+            keys = [key for key in keys if key not in self._local]
+        if not keys:
+            return
+        found = {
+            key: value for key, value in self.cache.get_many(keys).items()
+            if value != cached_db_kvstore.EMPTY_VALUE
+        }
+        missing = [key for key in keys if key not in found]
+        if missing:
+            stored = dict(KVStoreModel.objects.filter(
+                key__in=missing).values_list('key', 'value'))
+            self.cache.set_many(stored, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+            found.update(stored)
+        for key, value in found.items():
+            self._remember(key, value)
+
+
+def thumbnail_key(image, geometry, options):
+    """Ключ kvstore, под которым get_thumbnail ищет миниатюру."""
+    backend = default.backend
+    source = ImageFile(image)
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(source, geometry, options)
+    return add_prefix(ImageFile(name, default.storage).key)
+
+
+def prefetch_thumbnails(posts):
+    """Метаданные миниатюр всех постов страницы одним обращением."""
+    kvstore = default.kvstore
+    if not hasattr(kvstore, 'prefetch_raw'):
+        return
+    kvstore.prefetch_raw([
+        thumbnail_key(post.image, geometry, options)
+        for post in posts if post.image
+        for geometry, options in settings.THUMBNAIL_PRESETS
+    ])
@@ -6,9 +6,16 @@ urlpatterns = [
 
     path('', views.index, name='index'),
     path('new/', views.new_post, name='new_post'),
+    path('search/', views.search_posts, name='search'),
     path('group/<slug:slug>/', views.group_posts, name='group_posts'),
+    path('group/<slug:slug>/export/', views.group_export,
+         name='group_export'),
     path('<str:username>/', views.profile, name='profile'),
+    path('<str:username>/export/', views.profile_export,
+         name='profile_export'),
     path('<str:username>/<int:post_id>/', views.post_view, name='post'),
+    path('<str:username>/<int:post_id>/comments/', views.post_comments,
+         name='post_comments'),
     path('<str:username>/<int:post_id>/edit/',
          views.post_edit,
          name='post_edit'),
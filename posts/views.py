@@ -1,21 +1,45 @@
+from urllib.parse import quote
+
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import redirect, render
 from django.shortcuts import get_object_or_404
-from django.core.paginator import Paginator
 from django.urls import reverse
-from django.views.decorators.cache import cache_page
+from django.utils.cache import patch_cache_control
+from django.views.static import serve
 
 
-from .models import Post, Group, User
+from .cache import (FEED_GENERATION_KEY, GROUP_GENERATION_KEY,
+                    POST_GENERATION_KEY, author_generation_key,
+                    cache_anonymous_page)
+from .conditional import page_condition, post_scope
+from .export import FORMATS, export_rows
+from .models import Comment, Post, Group, User, author_posts_count
 from .forms import PostForm, CommentForm
-from yatube.settings import POSTS_PER_PAGE
+from .paginator import MAX_INTEGER, CursorPaginator
+from .search import search
+from .thumbnails import schedule_thumbnails
+from yatube.settings import COMMENTS_PER_PAGE, POSTS_PER_PAGE
+
+
+def get_page(request, post_list):
+    paginator = CursorPaginator(post_list, POSTS_PER_PAGE)
+    return paginator.get_cursor_page(request.GET.get('cursor'),
+                                     request.GET.get('page'))
+
+
+def get_comments_page(request, post):
+    paginator = CursorPaginator(
+        post.comments.select_related('author'), COMMENTS_PER_PAGE,
+        ordering=('-created', '-id'))
+    return paginator.get_cursor_page(request.GET.get('cursor'))
 
-#@cache_page(20)
+
+@cache_anonymous_page(FEED_GENERATION_KEY)
 def index(request):
-    post_list = Post.objects.all().order_by('-pub_date')
-    paginator = Paginator(post_list, POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    post_list = Post.objects.feed()
+    page = get_page(request, post_list)
 
     return render(
         request,
@@ -24,15 +48,13 @@ def index(request):
     )
 
 
+@cache_anonymous_page(GROUP_GENERATION_KEY)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()[:12]
-    paginator = Paginator(posts, POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    page = get_page(request, group.posts.feed())
     return render(request, 'group.html', {
                   'group': group,
-                  'posts': posts,
+                  'posts': page.object_list,
                   'page': page, })
 
 
@@ -45,16 +67,17 @@ def new_post(request):
     in_new_post = post_form.save(commit=False)
     in_new_post.author = request.user
     in_new_post.save()
+    schedule_thumbnails(in_new_post)
     return redirect('index')
 
 
+@cache_anonymous_page(author_generation_key)
 def profile(request, username):
-    user = get_object_or_404(User, username=username)
-    post_list = user.posts.all()
-    paginator = Paginator(post_list, POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    post_count = post_list.count()
+    user = get_object_or_404(User.objects.select_related('stats'),
+                             username=username)
+    post_list = user.posts.feed()
+    page = get_page(request, post_list)
+    post_count = author_posts_count(user)
 
     return render(
         request,
@@ -65,12 +88,45 @@ def profile(request, username):
          'author': user, })
 
 
+def export_response(request, queryset, name):
+    file_format = request.GET.get('format', 'jsonl')
+    if file_format not in FORMATS:
+        raise Http404
+    render_rows, content_type = FORMATS[file_format]
+    rows = export_rows(queryset, image_url=request.build_absolute_uri)
+    response = StreamingHttpResponse(
+        render_rows(rows), content_type=f'{content_type}; charset=utf-8')
+    # Имя пользователя может быть не ASCII: такое имя файла передаётся
+    # по RFC 5987, а старые клиенты получают запасное ASCII-имя.
+    filename = f'{name}-posts.{file_format}'
+    fallback = filename if filename.isascii() else f'posts.{file_format}'
+    response['Content-Disposition'] = (
+        f'attachment; filename="{fallback}"; '
+        f"filename*=UTF-8''{quote(filename)}")
+    return response
+
+
+@login_required
+def profile_export(request, username):
+    author = get_object_or_404(User, username=username)
+    return export_response(request, author.posts.all(), author.username)
+
+
+@login_required
+def group_export(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return export_response(request, group.posts.all(), group.slug)
+
+
+@page_condition(post_scope)
+@cache_anonymous_page(POST_GENERATION_KEY)
 def post_view(request, username, post_id):
-    post = get_object_or_404(Post, pk=post_id, author__username=username)
-    post_list = Post.objects.filter(author=post.author)
-    post_count = post_list.count()
+    post = get_object_or_404(
+        Post.objects.feed().select_related('author__stats'),
+        pk=post_id, author__username=username)
+    post_count = author_posts_count(post.author)
     form = CommentForm()
-    comments = post.comments.select_related('author').all()
+    comments = get_comments_page(request, post)
     return render(
         request,
         'post.html',
@@ -82,6 +138,15 @@ def post_view(request, username, post_id):
          })
 
 
+@cache_anonymous_page(POST_GENERATION_KEY)
+def post_comments(request, username, post_id):
+    post = get_object_or_404(Post.objects.select_related('author'),
+                             pk=post_id, author__username=username)
+    return render(request, 'include/comment_list.html', {
+                  'post': post,
+                  'comments': get_comments_page(request, post)})
+
+
 @login_required
 def post_edit(request, username, post_id):
     post = get_object_or_404(Post, author__username=username, id=post_id)
@@ -91,6 +156,7 @@ def post_edit(request, username, post_id):
                     files=request.FILES or None, instance=post)
     if form.is_valid():
         post.save()
+        schedule_thumbnails(post)
         return redirect(reverse('post_edit', kwargs={
                         'username': post.author.username, 'post_id': post_id}))
     return render(request, 'new.html', {
@@ -109,6 +175,40 @@ def add_comment(request, username, post_id):
     return redirect('post', username=username, post_id=post_id)
 
 
+def search_posts(request):
+    query = request.GET.get('q', '').strip()
+    try:
+        page_number = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page_number = 1
+    # OFFSET за пределами целых SQLite база не примет.
+    page_number = min(page_number,
+                      (MAX_INTEGER - POSTS_PER_PAGE) // POSTS_PER_PAGE)
+    offset = (page_number - 1) * POSTS_PER_PAGE
+    post_ids = search(Post, query, offset, POSTS_PER_PAGE + 1)
+    comment_ids = search(Comment, query, offset, POSTS_PER_PAGE + 1)
+    posts = Post.objects.feed().in_bulk(post_ids[:POSTS_PER_PAGE])
+    comments = Comment.objects.select_related(
+        'author', 'post__author').in_bulk(comment_ids[:POSTS_PER_PAGE])
+    # Индекс может вернуть id удалённой записи: она пропускается.
+    return render(request, 'search.html', {
+        'query': query,
+        'posts': [posts[pk] for pk in post_ids[:POSTS_PER_PAGE]
+                  if pk in posts],
+        'comments': [comments[pk] for pk in comment_ids[:POSTS_PER_PAGE]
+                     if pk in comments],
+        'page_number': page_number,
+        'has_next': max(len(post_ids), len(comment_ids)) > POSTS_PER_PAGE,
+    })
+
+
+def immutable_media(request, path):
+    response = serve(request, path, document_root=settings.MEDIA_ROOT)
+    patch_cache_control(response, public=True, immutable=True,
+                        max_age=settings.IMMUTABLE_MEDIA_MAX_AGE)
+    return response
+
+
 def page_not_found(request, exception):
     return render(request, "misc/404.html", {"path": request.path}, status=404)
 
@@ -0,0 +1,14 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def test_settings(settings, tmp_path):
+    """Настройки тестов, как в yatube.test_runner для manage.py test:
+    pytest-django не использует TEST_RUNNER. Метрики и кеш живут во
+    временных папках, лог медленных запросов отключён: тесты не должны
+    попадать в данные сервера."""
+    settings.DETECT_N_PLUS_ONE = True
+    settings.METRICS_DIR = str(tmp_path / 'metrics')
+    settings.SLOW_QUERY_SECONDS = None
+    settings.CACHES = {'default': dict(
+        settings.CACHES['default'], LOCATION=str(tmp_path / 'cache'))}
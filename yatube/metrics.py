@@ -0,0 +1,368 @@
+import fcntl
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache.backends import filebased, locmem
+from django.db import connections
+from django.http import Http404, HttpResponse
+from django.template.backends import django as django_backend
+from django.utils.crypto import constant_time_compare
+
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+HISTOGRAMS = {
+    'request_seconds': ('Время обработки запроса', TIME_BUCKETS),
+    'db_seconds': ('Время запросов к базе', TIME_BUCKETS),
+    'db_queries': ('Число запросов к базе', (0, 1, 2, 5, 10, 20, 50, 100)),
+    'template_seconds': ('Время рендеринга шаблонов', TIME_BUCKETS),
+    'response_bytes': ('Размер ответа',
+                       (1024, 10240, 102400, 1048576, 10485760)),
+}
+COUNTERS = {
+    'cache_hits_total': 'Попадания в кеш',
+    'cache_misses_total': 'Промахи кеша',
+}
+PREFIX = 'yatube_'
+
+# Замеры текущего запроса; None вне MetricsMiddleware.
+current_stats = ContextVar('current_stats', default=None)
+
+
+class RequestStats:
+    def __init__(self):
+        self.db_seconds = 0.0
+        self.db_queries = 0
+        self.template_seconds = 0.0
+        self.rendering = False
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+
+def empty_data():
+    return {'histograms': {name: {} for name in HISTOGRAMS},
+            'counters': {name: {} for name in COUNTERS}}
+
+
+def add_data(total, data):
+    """Прибавляет к total значения из файла процесса."""
+    for name, views in data['histograms'].items():
+        for view, histogram in views.items():
+            summed = total['histograms'][name].setdefault(view, {
+                'buckets': [0] * len(histogram['buckets']),
+                'sum': 0, 'count': 0})
+            summed['buckets'] = [
+                a + b for a, b in zip(summed['buckets'],
+                                      histogram['buckets'])]
+            summed['sum'] += histogram['sum']
+            summed['count'] += histogram['count']
+    for name, views in data['counters'].items():
+        for view, value in views.items():
+            total['counters'][name][view] = (
+                total['counters'][name].get(view, 0) + value)
+
+
+def write_json(path, data):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    # Через свой временный файл: читатель не увидит половину записи,
+    # а параллельные записи не подменят файл друг друга.
+    with tempfile.NamedTemporaryFile('w', dir=directory, suffix='.tmp',
+                                     delete=False) as file:
+        json.dump(data, file)
+    try:
+        os.replace(file.name, path)
+    except OSError:
+        os.remove(file.name)
+        raise
+
+
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def archive():
+    """Переносит файлы завершённых процессов в archive.json.
+
+    Иначе файлы копятся с каждым перезапуском воркеров. Блокировка не
+    даёт двум процессам перенести один файл дважды.
+    """
+    directory = settings.METRICS_DIR
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, 'archive.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        stale = []
+        for path in glob.glob(os.path.join(directory, '*-*.json')):
+            pid = os.path.basename(path).split('-', 1)[0]
+            if pid.isdigit() and not process_alive(int(pid)):
+                stale.append(path)
+        if not stale:
+            return
+        archive_path = os.path.join(directory, 'archive.json')
+        total = empty_data()
+        for path in [archive_path] + stale:
+            try:
+                with open(path) as file:
+                    add_data(total, json.load(file))
+            except (OSError, ValueError):
+                continue
+        write_json(archive_path, total)
+        for path in stale:
+            os.remove(path)
+
+
+class Registry:
+    """Гистограммы и счётчики процесса по именам url.
+
+    Каждый процесс не чаще раза в METRICS_FLUSH_SECONDS сохраняет свои
+    значения в METRICS_DIR/<pid>-<uuid>.json; /metrics/ складывает файлы
+    всех процессов. Счётчики в файле только растут, а файлы завершённых
+    процессов переносятся в archive.json, поэтому сумма не убывает.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pid = None
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.histograms = {name: {} for name in HISTOGRAMS}
+            self.counters = {name: {} for name in COUNTERS}
+            self.flushed = 0.0
+
+    def observe(self, view, stats, seconds, size):
+        values = {
+            'request_seconds': seconds,
+            'db_seconds': stats.db_seconds,
+            'db_queries': stats.db_queries,
+            'template_seconds': stats.template_seconds,
+            'response_bytes': size,
+        }
+        with self.lock:
+            for name, value in values.items():
+                buckets = HISTOGRAMS[name][1]
+                histogram = self.histograms[name].setdefault(
+                    view, {'buckets': [0] * (len(buckets) + 1),
+                           'sum': 0, 'count': 0})
+                index = next((index for index, bound in enumerate(buckets)
+                              if value <= bound), len(buckets))
+                histogram['buckets'][index] += 1
+                histogram['sum'] += value
+                histogram['count'] += 1
+            for name, value in (('cache_hits_total', stats.cache_hits),
+                                ('cache_misses_total', stats.cache_misses)):
+                counter = self.counters[name]
+                counter[view] = counter.get(view, 0) + value
+        self.flush()
+
+    def path(self):
+        # uuid в имени: процесс с тем же pid после перезапуска пишет в
+        # новый файл и не затирает счётчики предшественника.
+        pid = os.getpid()
+        if self.pid != pid:
+            self.pid = pid
+            self.name = f'{pid}-{uuid.uuid4().hex}.json'
+        return os.path.join(settings.METRICS_DIR, self.name)
+
+    def flush(self, force=False):
+        now = time.monotonic()
+        with self.lock:
+            if (not force and now - self.flushed
+                    < settings.METRICS_FLUSH_SECONDS):
+                return
+            self.flushed = now
+            data = {'histograms': self.histograms, 'counters': self.counters}
+            write_json(self.path(), data)
+
+    def collect(self):
+        """Сумма значений всех процессов."""
+        self.flush(force=True)
+        archive()
+        total = empty_data()
+        for path in glob.glob(os.path.join(settings.METRICS_DIR, '*.json')):
+            try:
+                with open(path) as file:
+                    add_data(total, json.load(file))
+            except (OSError, ValueError):
+                continue
+        return total['histograms'], total['counters']
+
+
+registry = Registry()
+
+
+def render_prometheus(histograms, counters):
+    lines = []
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        lines += [f'# HELP {PREFIX}{name} {help_text}',
+                  f'# TYPE {PREFIX}{name} histogram']
+        for view, histogram in sorted(histograms[name].items()):
+            cumulative = 0
+            for bound, count in zip(buckets + ('+Inf',),
+                                    histogram['buckets']):
+                cumulative += count
+                lines.append(f'{PREFIX}{name}_bucket{{view="{view}",'
+                             f'le="{bound}"}} {cumulative}')
+            label = f'{{view="{view}"}}'
+            lines += [f'{PREFIX}{name}_sum{label} {histogram["sum"]}',
+                      f'{PREFIX}{name}_count{label} {histogram["count"]}']
+    for name, help_text in COUNTERS.items():
+        lines += [f'# HELP {PREFIX}{name} {help_text}',
+                  f'# TYPE {PREFIX}{name} counter']
+        for view, value in sorted(counters[name].items()):
+            lines.append(f'{PREFIX}{name}{{view="{view}"}} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics(request):
+    """Метрики в текстовом формате Prometheus.
+
+    Доступны сотрудникам и по токену METRICS_TOKEN: за прокси адрес
+    клиента всегда локальный, поэтому по нему доступ не проверяется.
+    """
+    token = settings.METRICS_TOKEN
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    if not request.user.is_staff and not (
+            token and constant_time_compare(authorization,
+                                            f'Bearer {token}')):
+        raise Http404
+    return HttpResponse(render_prometheus(*registry.collect()),
+                        content_type='text/plain; version=0.0.4')
+
+
+class MetricsMiddleware:
+    """Замеряет каждый запрос и складывает результат в registry.
+
+    Запросы без имени url учитываются как unmatched, сам /metrics/
+    не учитывается.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = RequestStats()
+        token = current_stats.set(stats)
+
+        def timed(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                stats.db_seconds += time.perf_counter() - started
+                stats.db_queries += 1
+
+        started = time.perf_counter()
+        # Потоковый ответ читает базу уже после выхода из middleware,
+        # поэтому для него обёртки снимаются, когда он отдан целиком.
+        wrappers = ExitStack()
+        try:
+            for connection in connections.all():
+                wrappers.enter_context(connection.execute_wrapper(timed))
+            response = self.get_response(request)
+        except BaseException:
+            wrappers.close()
+            raise
+        finally:
+            current_stats.reset(token)
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        if response.streaming:
+            response.streaming_content = self.count_streamed(
+                response.streaming_content, view, stats, started, wrappers)
+            return response
+        wrappers.close()
+        if view != 'metrics':
+            registry.observe(view, stats, time.perf_counter() - started,
+                             len(response.content))
+        return response
+
+    @staticmethod
+    def count_streamed(content, view, stats, started, wrappers):
+        size = 0
+        try:
+            for chunk in content:
+                size += len(chunk)
+                yield chunk
+        finally:
+            wrappers.close()
+            registry.observe(view, stats, time.perf_counter() - started,
+                             size)
+
+
+class Template(django_backend.Template):
+    def render(self, context=None, request=None):
+        stats = current_stats.get()
+        if stats is None or stats.rendering:
+            return super().render(context, request)
+        stats.rendering = True
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            stats.template_seconds += time.perf_counter() - started
+            stats.rendering = False
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """Шаблоны Django с замером времени рендеринга для метрик.
+
+    Вложенные include рендерятся внутри внешнего шаблона и отдельно
+    не считаются.
+    """
+
+    def from_string(self, template_code):
+        return Template(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return Template(super().get_template(template_name).template, self)
+
+
+MISSING = object()
+
+
+class CacheMetricsMixin:
+    """Считает попадания и промахи кеша для метрик запроса."""
+
+    def count(self, hits, misses):
+        stats = current_stats.get()
+        if stats is not None:
+            stats.cache_hits += hits
+            stats.cache_misses += misses
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, MISSING, version)
+        self.count(value is not MISSING, value is MISSING)
+        return default if value is MISSING else value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        # Базовый get_many может звать get для каждого ключа.
+        token = current_stats.set(None)
+        try:
+            found = super().get_many(keys, version)
+        finally:
+            current_stats.reset(token)
+        self.count(len(found), len(keys) - len(found))
+        return found
+
+
+class LocMemCache(CacheMetricsMixin, locmem.LocMemCache):
+    pass
+
+
+class FileBasedCache(CacheMetricsMixin, filebased.FileBasedCache):
+    pass
@@ -0,0 +1,145 @@
+import cProfile
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core import signing
+from django.template.base import Node, Template, TokenType
+from django.utils import timezone
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+PROFILE_PARAM = 'profile'
+SALT = 'yatube.profiling'
+
+
+def make_token():
+    """Подписанный токен для заголовка X-Profile или ?profile=."""
+    return signing.TimestampSigner(salt=SALT).sign('profile')
+
+
+def valid_token(token):
+    try:
+        signing.TimestampSigner(salt=SALT).unsign(
+            token, max_age=settings.PROFILE_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def frame_name(frame):
+    """Имя кадра для стека; шаблоны и теги подписаны строкой шаблона."""
+    code = frame.f_code
+    if code is Template.render.__code__:
+        origin = frame.f_locals['self'].origin
+        return f'template {origin.template_name or origin.name}'
+    if code is Node.render_annotated.__code__:
+        node = frame.f_locals['self']
+        token = node.token
+        if token is not None:
+            origin = node.origin
+            tag = (f'{{{{ {token.contents} }}}}'
+                   if token.token_type == TokenType.VAR
+                   else f'{{% {token.contents.split(" ", 1)[0]} %}}')
+            return (f'{tag} {origin.template_name or origin.name}:'
+                    f'{token.lineno}')
+    module = frame.f_globals.get('__name__', '?')
+    return f'{module}.{code.co_name}'
+
+
+class StackSampler(threading.Thread):
+    """Снимает стек потока запроса каждые interval секунд.
+
+    cProfile не хранит полных стеков, поэтому для flamegraph стеки
+    собираются выборкой; число выборок пропорционально времени.
+    """
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name='profile-sampler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                names.append(frame_name(frame).replace(';', ','))
+                frame = frame.f_back
+            if names:
+                self.stacks[';'.join(reversed(names))] += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+class ProfilerMiddleware:
+    """Профилирует запрос вместе со всеми middleware, view и шаблонами.
+
+    Запрос профилируется по подписанному токену из make_token() в
+    заголовке X-Profile или параметре ?profile=, либо случайно с
+    вероятностью PROFILE_SAMPLE_RATE. В PROFILE_DIR пишутся .pstats,
+    свёрнутые стеки .collapsed для flamegraph и .json с описанием.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        trigger = self.trigger(request)
+        if trigger is None:
+            return self.get_response(request)
+        profile = cProfile.Profile()
+        sampler = StackSampler(threading.get_ident(),
+                               settings.PROFILE_SAMPLE_INTERVAL)
+        sampler.start()
+        started = time.perf_counter()
+        profile.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            profile.disable()
+            duration = time.perf_counter() - started
+            sampler.stop()
+        match = request.resolver_match
+        self.save(profile, sampler.stacks, {
+            'time': timezone.now().isoformat(),
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else 'unmatched',
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 3),
+            'trigger': trigger,
+        })
+        return response
+
+    @staticmethod
+    def trigger(request):
+        token = (request.META.get(PROFILE_HEADER)
+                 or request.GET.get(PROFILE_PARAM))
+        if token and valid_token(token):
+            return 'token'
+        if random.random() < settings.PROFILE_SAMPLE_RATE:
+            return 'sample'
+        return None
+
+    @staticmethod
+    def save(profile, stacks, meta):
+        os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+        name = (f'{timezone.now():%Y%m%dT%H%M%S%f}-{os.getpid()}-'
+                f'{meta["view"].replace(":", "-")}')
+        base = os.path.join(settings.PROFILE_DIR, name)
+        profile.dump_stats(f'{base}.pstats')
+        with open(f'{base}.collapsed', 'w', encoding='utf-8') as file:
+            for stack, count in stacks.most_common():
+                file.write(f'{stack} {count}\n')
+        # Описание пишется последним: по нему профиль считается готовым.
+        with open(f'{base}.json', 'w', encoding='utf-8') as file:
+            json.dump(meta, file, ensure_ascii=False)
@@ -0,0 +1,117 @@
+import re
+import sys
+import traceback
+from collections import defaultdict
+from contextlib import ContextDecorator, ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.template.base import Node, TokenType
+from django.test.utils import CaptureQueriesContext
+
+# Списки параметров разной длины дают один и тот же вид запроса.
+IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+
+
+def normalize_sql(sql):
+    return IN_LIST.sub('IN (...)', ' '.join(sql.split()))
+
+
+class query_budget(ContextDecorator):
+    """Падает, если внутри блока выполнено больше limit запросов.
+
+    Работает и как декоратор. В сообщение попадают все запросы,
+    чтобы было видно, какой из них лишний.
+    """
+
+    def __init__(self, limit, using=DEFAULT_DB_ALIAS):
+        self.limit = limit
+        self.using = using
+
+    def __enter__(self):
+        self.captured = CaptureQueriesContext(connections[self.using])
+        self.captured.__enter__()
+        return self.captured
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.captured.__exit__(exc_type, exc_value, tb)
+        if exc_type is not None or len(self.captured) <= self.limit:
+            return
+        queries = '\n'.join(
+            f'{number}. {query["sql"]}'
+            for number, query in enumerate(self.captured, 1))
+        raise AssertionError(
+            f'Запросов {len(self.captured)} при бюджете {self.limit}:\n'
+            f'{queries}')
+
+
+class NPlusOneError(AssertionError):
+    pass
+
+
+def query_origin():
+    """Строка шаблона или кода, из которой пришёл запрос."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        if frame.f_code is Node.render_annotated.__code__:
+            node = frame.f_locals['self']
+            if node.token is not None:
+                token = node.token
+                contents = (f'{{{{ {token.contents} }}}}'
+                            if token.token_type == TokenType.VAR
+                            else f'{{% {token.contents} %}}')
+                name = node.origin.template_name or node.origin.name
+                return f'{name}:{token.lineno} {contents}'
+        frame = frame.f_back
+    for entry in reversed(traceback.extract_stack()):
+        if (entry.filename.startswith(settings.BASE_DIR)
+                and entry.filename != __file__):
+            return f'{entry.filename}:{entry.lineno}'
+    return 'неизвестно'
+
+
+class NPlusOneMiddleware:
+    """Ловит запрос одного вида, повторённый с разными параметрами.
+
+    Такой повтор в одном HTTP-запросе - почти всегда обращение к базе
+    в цикле, например {{ post.comments.count }} для каждого поста.
+    Включается настройкой DETECT_N_PLUS_ONE, которую ставят тестовый
+    раннер и фикстура pytest; в остальное время middleware отключено.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'DETECT_N_PLUS_ONE', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        shapes = defaultdict(dict)
+
+        def record(execute, sql, params, many, context):
+            shape = shapes[normalize_sql(sql)]
+            key = repr(params)
+            if key not in shape:
+                shape[key] = query_origin()
+            return execute(sql, params, many, context)
+
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(record))
+            response = self.get_response(request)
+            if response.streaming:
+                return response
+            self.check(request, shapes)
+        return response
+
+    @staticmethod
+    def check(request, shapes):
+        for sql, calls in shapes.items():
+            if len(calls) < settings.N_PLUS_ONE_THRESHOLD or any(
+                    f'"{table}"' in sql
+                    for table in settings.N_PLUS_ONE_IGNORED_TABLES):
+                continue
+            origins = sorted(set(calls.values()))
+            raise NPlusOneError(
+                f'{request.path}: запрос повторён {len(calls)} раз с разными '
+                f'параметрами из {", ".join(origins)}:\n{sql}')
@@ -0,0 +1,68 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+
+PRIMARY = 'default'
+
+# Разрешено ли читать с реплики в текущем запросе.
+replica_reads = ContextVar('replica_reads', default=False)
+
+
+class ReplicaRouter:
+    """Чтение в отмеченных view идёт на случайную реплику из
+    DATABASE_REPLICAS, запись и всё остальное - на основную базу.
+
+    Сессии всегда читаются с основной базы: реплика может ещё не знать
+    о только что выполненном входе.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if (not replicas or not replica_reads.get()
+                or model._meta.app_label == 'sessions'):
+            return PRIMARY
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики - копии основной базы, объекты с них связываются свободно.
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaRoutingMiddleware:
+    """Включает чтение с реплик для GET-запросов к REPLICA_READ_VIEWS.
+
+    После успешного изменяющего запроса клиент получает cookie, и на
+    REPLICA_PIN_SECONDS его чтения закрепляются за основной базой,
+    чтобы он сразу увидел свой пост или комментарий.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = replica_reads.set(False)
+        try:
+            response = self.get_response(request)
+        finally:
+            replica_reads.reset(token)
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and (
+                response.status_code < 400):
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE, '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True, samesite='Lax')
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        replica_reads.set(
+            request.method in ('GET', 'HEAD')
+            and request.resolver_match.url_name
+            in settings.REPLICA_READ_VIEWS
+            and settings.REPLICA_PIN_COOKIE not in request.COOKIES)
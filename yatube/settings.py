@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -49,22 +50,36 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'yatube.profiling.ProfilerMiddleware',
+    'yatube.metrics.MetricsMiddleware',
+    'yatube.queries.NPlusOneMiddleware',
+    'yatube.slow_queries.SlowQueryViewMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'yatube.routers.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
 
+TEST_RUNNER = 'yatube.test_runner.TestRunner'
+# Поиск N+1: запрос одного вида с N_PLUS_ONE_THRESHOLD разными наборами
+# параметров за HTTP-запрос роняет тест. Включается тестовым раннером.
+DETECT_N_PLUS_ONE = False
+N_PLUS_ONE_THRESHOLD = 3
+# Недостающую миниатюру sorl создаёт при рендеринге, обращаясь к kvstore
+# по ключу на запись; готовые миниатюры страницы читаются одним запросом.
+N_PLUS_ONE_IGNORED_TABLES = ('thumbnail_kvstore',)
+
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'yatube.metrics.DjangoTemplates',
         "DIRS": [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -85,13 +100,86 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# Настройки SQLite для конкурентной записи: WAL не блокирует читателей,
+# писатели ждут друг друга до busy_timeout мс, cache_size - в КиБ.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+}
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'yatube.sqlite',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': 60,
+        'OPTIONS': {
+            'pragmas': SQLITE_PRAGMAS,
+            'transaction_mode': 'IMMEDIATE',
+        },
+    }
+}
+
+# Копии базы только для чтения, пути через os.pathsep в YATUBE_REPLICAS.
+# Чтобы добавить реплику, view трогать не нужно.
+DATABASE_REPLICAS = []
+for index, path in enumerate(
+        filter(None, os.environ.get('YATUBE_REPLICAS', '').split(os.pathsep))):
+    alias = f'replica{index}'
+    DATABASES[alias] = {
+        'ENGINE': 'yatube.sqlite',
+        'NAME': f'file:{path}?mode=ro',
+        'CONN_MAX_AGE': 60,
+        'OPTIONS': {'pragmas': {
+            name: value for name, value in SQLITE_PRAGMAS.items()
+            if name != 'journal_mode'}},
+        'TEST': {'MIRROR': 'default'},
     }
+    DATABASE_REPLICAS.append(alias)
+
+# Запросы дольше SLOW_QUERY_SECONDS пишутся с параметрами, view и планом
+# в SLOW_QUERY_LOG (JSONL); None отключает лог. В лог пишут все воркеры,
+# а RotatingFileHandler при нескольких процессах теряет записи на
+# ротации, поэтому файл ротирует logrotate, а WatchedFileHandler
+# переоткрывает его после переименования.
+SLOW_QUERY_SECONDS = 0.1
+SLOW_QUERY_LOG = os.environ.get(
+    'YATUBE_SLOW_QUERY_LOG',
+    os.path.join(tempfile.gettempdir(), 'yatube-slow-queries.jsonl'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'slow_queries': {
+            'class': 'logging.handlers.WatchedFileHandler',
+            'filename': SLOW_QUERY_LOG,
+            'encoding': 'utf-8',
+            'delay': True,
+            'formatter': 'message',
+        },
+    },
+    'loggers': {
+        'yatube.slow_queries': {
+            'handlers': ['slow_queries'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
 }
 
+DATABASE_ROUTERS = ['yatube.routers.ReplicaRouter']
+# Имена url, чтение в которых может идти с реплики.
+REPLICA_READ_VIEWS = ('index', 'group_posts', 'profile', 'post',
+                      'post_comments')
+REPLICA_PIN_COOKIE = 'primary_pin'
+REPLICA_PIN_SECONDS = 10
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -134,6 +222,9 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Картинки постов адресуются по содержимому, их можно кешировать навсегда.
+# В продакшене этот заголовок для /media/posts/ выставляет веб-сервер.
+IMMUTABLE_MEDIA_MAX_AGE = 60 * 60 * 24 * 365
 
 LOGIN_URL = "/auth/login/"
 LOGIN_REDIRECT_URL = "index"
@@ -143,9 +234,57 @@ EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 POSTS_PER_PAGE = 10
-
+COMMENTS_PER_PAGE = 20
+
+# Страницы для анонимов инвалидируются сигналами, срок жизни лишь
+# ограничивает память кеша.
+ANONYMOUS_PAGE_CACHE_TIMEOUT = 60 * 60
+
+# Загрузки больше FILE_UPLOAD_MAX_MEMORY_SIZE пишутся во временный файл
+# по частям, а не держатся в памяти.
+FILE_UPLOAD_MAX_MEMORY_SIZE = 512 * 1024
+POST_IMAGE_MAX_UPLOAD_SIZE = 20 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 50_000_000
+POST_IMAGE_MAX_SIDE = 2048
+
+# Размеры миниатюр, которые создаются заранее при загрузке картинки.
+# Должны совпадать с тегами {% thumbnail %} в шаблонах.
+THUMBNAIL_PRESETS = (
+    ('960x339', {'crop': 'center', 'upscale': True}),
+)
+THUMBNAIL_WORKERS = 2
+THUMBNAIL_KVSTORE = 'posts.thumbnails.KVStore'
+THUMBNAIL_LOCAL_CACHE_SIZE = 10000
+
+# Кеш общий для всех процессов сервера: версии карточек и поколения
+# страниц, сменённые в одном воркере, сразу видят остальные. Кеш в
+# памяти процесса так не умеет. Файловый кеш работает в пределах
+# одной машины; для нескольких машин нужен memcached.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'yatube.metrics.FileBasedCache',
+        'LOCATION': os.environ.get(
+            'YATUBE_CACHE_DIR',
+            os.path.join(tempfile.gettempdir(), 'yatube-cache')),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
     }
 }
+
+# Метрики запросов для /metrics/. Процессы сохраняют их в METRICS_DIR
+# не чаще раза в METRICS_FLUSH_SECONDS, страница складывает все файлы.
+METRICS_DIR = os.environ.get(
+    'YATUBE_METRICS_DIR',
+    os.path.join(tempfile.gettempdir(), 'yatube-metrics'))
+METRICS_FLUSH_SECONDS = 5
+# Страницу видят сотрудники и запросы с заголовком
+# Authorization: Bearer <METRICS_TOKEN>. Без токена доступ только у staff.
+METRICS_TOKEN = os.environ.get('YATUBE_METRICS_TOKEN')
+
+# Профили запросов: по токену из `manage.py profiles token` в заголовке
+# X-Profile или ?profile=, либо случайная доля PROFILE_SAMPLE_RATE.
+PROFILE_DIR = os.environ.get(
+    'YATUBE_PROFILE_DIR',
+    os.path.join(tempfile.gettempdir(), 'yatube-profiles'))
+PROFILE_SAMPLE_RATE = 0.0
+PROFILE_SAMPLE_INTERVAL = 0.001
+PROFILE_TOKEN_MAX_AGE = 60 * 60
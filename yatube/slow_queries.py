@@ -0,0 +1,89 @@
+import json
+import logging
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.utils import timezone
+
+from .queries import normalize_sql
+
+logger = logging.getLogger(__name__)
+
+# Запросы, у которых есть план; DDL не объясняется.
+EXPLAINED = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE')
+# Имя url запроса, в котором выполняются запросы к базе.
+current_view = ContextVar('current_view', default=None)
+
+
+def explain(connection, sql, params):
+    """План запроса SQLite; курсор без обёрток Django, чтобы EXPLAIN
+    не попал ни в замеры, ни в этот же лог."""
+    if connection.vendor != 'sqlite' or not sql.lstrip().upper().startswith(
+            EXPLAINED):
+        return None
+    cursor = connection.create_cursor()
+    try:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return [row[-1] for row in cursor.fetchall()]
+    except connection.Database.Error:
+        return None
+    finally:
+        cursor.close()
+
+
+def log_slow_queries(execute, sql, params, many, context):
+    """Обёртка execute: запросы дольше SLOW_QUERY_SECONDS пишутся
+    в лог yatube.slow_queries одной строкой JSON."""
+    threshold = settings.SLOW_QUERY_SECONDS
+    if threshold is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    result = execute(sql, params, many, context)
+    duration = time.perf_counter() - started
+    if duration >= threshold:
+        connection = context['connection']
+        logger.info(json.dumps({
+            'time': timezone.now().isoformat(),
+            'duration_ms': round(duration * 1000, 3),
+            'database': connection.alias,
+            'view': current_view.get(),
+            'sql': sql,
+            'shape': normalize_sql(sql),
+            'params': None if many else params,
+            'plan': None if many else explain(connection, sql, params),
+        }, ensure_ascii=False, default=str))
+    return result
+
+
+class SlowQueryViewMiddleware:
+    """Запоминает имя url, чтобы медленный запрос знал своё view."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = current_view.set(None)
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            current_view.reset(token)
+            raise
+        # Потоковый ответ читает базу уже после выхода из middleware,
+        # поэтому для него имя сбрасывается, когда он отдан целиком.
+        if response.streaming:
+            response.streaming_content = self.reset_after(
+                response.streaming_content, token)
+        else:
+            current_view.reset(token)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        current_view.set(request.resolver_match.view_name)
+
+    @staticmethod
+    def reset_after(content, token):
+        try:
+            yield from content
+        finally:
+            current_view.reset(token)
@@ -0,0 +1,42 @@
+from django.db.backends.sqlite3 import base
+
+from yatube.slow_queries import log_slow_queries
+
+
+def apply_pragmas(connection, pragmas):
+    for name, value in pragmas.items():
+        connection.execute(f'PRAGMA {name} = {value}')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """SQLite с настройками соединения из OPTIONS.
+
+    ``pragmas`` выполняются на каждом новом соединении (journal_mode=WAL
+    запоминается в файле базы, остальные действуют на соединение).
+    ``transaction_mode`` задаёт вид BEGIN для atomic: с IMMEDIATE
+    блокировка записи берётся в начале транзакции, и конкурирующие
+    писатели ждут busy_timeout, а не получают "database is locked"
+    при повышении блокировки чтения до записи.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Постоянная внешняя обёртка: пишет в лог медленные запросы.
+        self.execute_wrappers.append(log_slow_queries)
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.pragmas = params.pop('pragmas', {})
+        self.transaction_mode = params.pop('transaction_mode', None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        apply_pragmas(connection, self.pragmas)
+        return connection
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode:
+            self.cursor().execute(f'BEGIN {self.transaction_mode}')
+        else:
+            super()._start_transaction_under_autocommit()
@@ -0,0 +1,25 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    """Включает поиск N+1 во всех запросах к сайту. Метрики запросов
+    и кеш живут во временных папках, лог медленных запросов отключён:
+    тесты не должны попадать в данные сервера."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        settings.DETECT_N_PLUS_ONE = True
+        settings.METRICS_DIR = tempfile.mkdtemp()
+        settings.SLOW_QUERY_SECONDS = None
+        settings.CACHES = {'default': dict(
+            settings.CACHES['default'], LOCATION=tempfile.mkdtemp())}
+
+    def teardown_test_environment(self, **kwargs):
+        shutil.rmtree(settings.METRICS_DIR, ignore_errors=True)
+        shutil.rmtree(settings.CACHES['default']['LOCATION'],
+                      ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
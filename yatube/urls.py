@@ -1,9 +1,11 @@
 from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
-from django.urls import include, path
+from django.urls import include, path, re_path
 from django.conf.urls import handler404, handler500
 from posts import views
+from posts.storage import HASHED_NAME_PATTERN
+from yatube import metrics
 
 
 urlpatterns = [
@@ -13,12 +15,19 @@ urlpatterns = [
     path("auth/", include("users.urls")),
     path("auth/", include("django.contrib.auth.urls")),
     path("admin/", admin.site.urls),
+    path('api/v1/', include('posts.api_urls', namespace='api')),
+    path('metrics/', metrics.metrics, name='metrics'),
     path("", include("posts.urls")),
 ]
 handler404 = "posts.views.page_not_found"  # noqa
 handler500 = "posts.views.server_error"  # noqa
 
 if settings.DEBUG:
+    # Картинки постов названы по хешу содержимого и не меняются.
+    urlpatterns += [
+        re_path(r'^media/(?P<path>posts/%s)$' % HASHED_NAME_PATTERN,
+                views.immutable_media),
+    ]
     urlpatterns += static(settings.MEDIA_URL,
                           document_root=settings.MEDIA_ROOT)
     urlpatterns += static(settings.STATIC_URL,